@@ -1,197 +1,836 @@
 import chess
-from typing import Optional, Tuple, Dict
-import random
+import math
+import time
+from typing import Callable, Optional, Tuple, List, Set
+from game import VariantBoard, compute_material_pst
+from pst import PIECE_VALUES, PAWN_TABLE, KNIGHT_TABLE, PST_SCALE
+from moveorder import SEE_VALUES, MovePicker, OrderingTables, captured_piece_type, mvv_lva, static_exchange
+from transposition import TranspositionTable, BOUND_EXACT, BOUND_LOWER, BOUND_UPPER
+from parallel import create_helpers
+from book import OpeningBook
+from bitbase import Bitbases, DEFAULT_DIRECTORY as BITBASE_DIRECTORY
+from searchstats import CUTOFF_BUCKETS, SearchStats, StatsSink
+from analysis import AnalysisLine
+
+# Center control masks (with expanded center)
+CENTER_INNER = chess.BB_E4 | chess.BB_E5 | chess.BB_D4 | chess.BB_D5
+CENTER_OUTER = (chess.BB_C3 | chess.BB_C4 | chess.BB_C5 | chess.BB_C6 |
+                chess.BB_D3 | chess.BB_D6 | chess.BB_E3 | chess.BB_E6 |
+                chess.BB_F3 | chess.BB_F4 | chess.BB_F5 | chess.BB_F6)
+
+# Squares directly in front of a king on each square, per color
+KING_SHIELD_MASKS = [[0] * 64 for _ in chess.COLORS]
+for _square in chess.SQUARES:
+    _file, _rank = chess.square_file(_square), chess.square_rank(_square)
+    for _color, _forward in ((chess.WHITE, 1), (chess.BLACK, -1)):
+        if 0 <= _rank + _forward <= 7:
+            for _file_offset in (-1, 0, 1):
+                if 0 <= _file + _file_offset <= 7:
+                    KING_SHIELD_MASKS[_color][_square] |= chess.BB_SQUARES[
+                        chess.square(_file + _file_offset, _rank + _forward)]
+
+popcount = chess.popcount
+
+# Depth cap for searches limited only by time or nodes
+MAX_DEPTH = 64
+# How often (in nodes) the clock is checked
+CHECK_INTERVAL = 256
+# Mate scores are MATE_SCORE minus the distance to mate in plies
+MATE_SCORE = 100000.0
+MATE_BOUND = MATE_SCORE - 1000
+# Evaluation scores are multiples of 0.5, so this is the narrowest window
+NULL_WINDOW = 0.5
+# Late move reductions apply from this move index on, at this minimum depth
+LMR_MIN_INDEX = 3
+LMR_MIN_DEPTH = 3
+# Shallow-depth futility pruning margin per ply of depth
+FUTILITY_DEPTH = 3
+FUTILITY_MARGIN = 150
+LMR_REDUCTIONS = [[0] * 64 for _ in range(64)]
+for _depth in range(1, 64):
+    for _index in range(1, 64):
+        LMR_REDUCTIONS[_depth][_index] = int(0.75 + math.log(_depth) * math.log(_index) / 2.0)
+# Quiescence search: maximum capture depth and delta pruning safety margin
+MAX_QUIESCENCE_PLY = 16
+DELTA_MARGIN = 200
+# Bitbase wins score above any evaluation and below mate scores
+KNOWN_WIN = 10000.0
+
+
+class SearchAborted(Exception):
+    pass
+
 
 class ChessAI:
-    def __init__(self, depth: int = 3):
+    def __init__(self, depth: int = 3, hash_mb: float = 16, workers: int = 1,
+                 book: Optional[str] = None, bitbases: Optional[str] = BITBASE_DIRECTORY):
         self.depth = depth
-        # Enhanced piece values with position-dependent scoring
-        self.piece_values = {
-            chess.PAWN: 100,
-            chess.KNIGHT: 320,
-            chess.BISHOP: 330,
-            chess.ROOK: 500,
-            chess.QUEEN: 900,
-            chess.KING: 20000
-        }
-
-        # Piece-Square Tables for positional evaluation
-        self.pawn_table = [
-            0,  0,  0,  0,  0,  0,  0,  0,
-            50, 50, 50, 50, 50, 50, 50, 50,
-            10, 10, 20, 30, 30, 20, 10, 10,
-            5,  5, 10, 25, 25, 10,  5,  5,
-            0,  0,  0, 20, 20,  0,  0,  0,
-            5, -5,-10,  0,  0,-10, -5,  5,
-            5, 10, 10,-20,-20, 10, 10,  5,
-            0,  0,  0,  0,  0,  0,  0,  0
-        ]
-
-        self.knight_table = [
-            -50,-40,-30,-30,-30,-30,-40,-50,
-            -40,-20,  0,  0,  0,  0,-20,-40,
-            -30,  0, 10, 15, 15, 10,  0,-30,
-            -30,  5, 15, 20, 20, 15,  5,-30,
-            -30,  0, 15, 20, 20, 15,  0,-30,
-            -30,  5, 10, 15, 15, 10,  5,-30,
-            -40,-20,  0,  5,  5,  0,-20,-40,
-            -50,-40,-30,-30,-30,-30,-40,-50
-        ]
-
-        # Cache for transposition table
-        self.transposition_table: Dict[str, Tuple[float, Optional[chess.Move]]] = {}
+        # Piece values and piece-square tables are shared with VariantBoard,
+        # which keeps their totals up to date incrementally
+        self.piece_values = PIECE_VALUES
+        self.pawn_table = PAWN_TABLE
+        self.knight_table = KNIGHT_TABLE
+
+        # Fixed-size transposition table, keyed by the board's Zobrist key. With
+        # workers > 1 it lives in shared memory and helper processes search the
+        # same position (Lazy SMP); without shared memory this falls back to a
+        # single-process search.
+        self.helpers = create_helpers(workers, hash_mb)
+        self.workers = self.helpers.helpers + 1 if self.helpers else 1
+        self.transposition_table = self.helpers.table if self.helpers else TranspositionTable(hash_mb)
+
+        # Optional memory-mapped opening book, probed before searching
+        self.book = OpeningBook(book) if book else None
+        # KPK/KRK/KQK win/draw tables, probed at three-piece nodes (None when
+        # no tables were generated)
+        self.bitbases = Bitbases(bitbases) if bitbases else None
+        if not self.bitbases:
+            self.bitbases = None
+
+        # Killer moves and history heuristic for move ordering
+        self.ordering = OrderingTables()
+
+        # Search state and results of the last get_best_move call
+        self.nodes = 0
+        self.qnodes = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.cutoff_histogram = [0] * CUTOFF_BUCKETS
+        self.tt_cutoffs = 0
+        self.helper_nodes = 0
+        self.bitbase_hits = 0
+        self.completed_depth = 0
+        self.last_score = 0.0
+        self.pv: List[chess.Move] = []
+        # (depth, nodes, seconds) for each completed iteration, cumulative
+        self.iterations: List[Tuple[int, int, float]] = []
+        self._deadline: Optional[float] = None
+        self._max_nodes: Optional[int] = None
+        self._next_check = CHECK_INTERVAL
+        # Shared flag (anything with a truthy .value) that aborts the search when set
+        self.stop_flag = None
+        # Set by stop() from another thread; cleared when a search starts
+        self._stop_requested = False
+        self._time_limit: Optional[float] = None
+        self._start = 0.0
+        # Root moves allowed by a bitbase probe at the root, None for all
+        self._root_moves: Optional[Set[chess.Move]] = None
+        # Root moves skipped by analyse() for the lines already found
+        self._excluded_moves: Set[chess.Move] = set()
+        # (position, multipv) of the last analyse() that reached its full
+        # depth, with its depth and lines, so a deeper call can continue it
+        self._analysis: Optional[Tuple[Tuple, int, List[AnalysisLine]]] = None
+        # Structured stats of the last search, only collected after enable_stats()
+        self.stats: Optional[SearchStats] = None
+        self.stats_sink: Optional[StatsSink] = None
+        self.collect_stats = False
+        self._tt_counts = (0, 0)
+        # Called after every completed iteration with (depth, score, seconds);
+        # returning True ends the search, e.g. when a time manager sees a
+        # stable best move
+        self.iteration_callback: Optional[Callable[[int, float, float], bool]] = None
+
+    def stop(self) -> None:
+        # Ends a search running in another thread at its next budget check;
+        # get_best_move then returns the best move of the last completed depth
+        self._stop_requested = True
+        self._next_check = 0
+
+    def ponderhit(self, time_limit: Optional[float]) -> None:
+        # Turns a running ponder search (no limits) into a timed one. Time
+        # already spent pondering counts, so a long ponder answers at once.
+        self._time_limit = time_limit
+        if time_limit is not None and self.completed_depth >= 1:
+            self._deadline = self._start + time_limit
+            self._next_check = 0
+
+    def enable_stats(self, sink: Optional[StatsSink] = None) -> None:
+        # Collects a SearchStats for every search and passes it to sink (a
+        # callable such as searchstats.JsonLinesWriter). The timed evaluation
+        # is swapped in on this instance only while a search runs, so other
+        # calls and disabled engines run the plain one.
+        self.collect_stats = True
+        self.stats_sink = sink
+
+    def disable_stats(self) -> None:
+        self.collect_stats = False
+        self.stats_sink = None
+        self.__dict__.pop("evaluate_position", None)
+
+    def new_game(self) -> None:
+        # Keeps the transposition table across games: entries only age, since
+        # openings and common middlegames come up again. Killers and history
+        # belong to the old game and are reset.
+        self.transposition_table.new_search()
+        self.ordering = OrderingTables()
+        self._analysis = None
+
+    def clear(self) -> None:
+        # Empties the table and the ordering tables, so the next search
+        # depends only on its position and limits
+        self.transposition_table.clear()
+        self.ordering = OrderingTables()
+        self._analysis = None
+
+    def save_hash(self, path: str) -> None:
+        self.transposition_table.save(path)
+
+    def load_hash(self, path: str) -> bool:
+        # False (and an unchanged table) when the file is missing or was saved
+        # with a different table size
+        self._analysis = None
+        return self.transposition_table.load(path)
+
+    def close(self) -> None:
+        # Stops the helper processes and releases the shared table and book
+        if self.helpers:
+            self.helpers.close()
+            self.helpers = None
+        if self.book is not None:
+            self.book.close()
+            self.book = None
 
     def evaluate_position(self, board: chess.Board) -> float:
-        if board.is_checkmate():
-            return float('-inf') if board.turn else float('inf')
-
-        if board.is_stalemate() or board.is_insufficient_material():
-            return 0.0
-
-        score = 0.0
-
-        # Material and position evaluation
-        for square in chess.SQUARES:
-            piece = board.piece_at(square)
-            if piece is not None:
-                # Base material value
-                value = self.piece_values[piece.piece_type]
-
-                # Add positional bonus
-                if piece.piece_type == chess.PAWN:
-                    value += self.pawn_table[square if piece.color else 63 - square] * 0.1
-                elif piece.piece_type == chess.KNIGHT:
-                    value += self.knight_table[square if piece.color else 63 - square] * 0.1
-
-                score += value if piece.color else -value
-
-        # Mobility evaluation
-        mobility_score = len(list(board.legal_moves)) * 10
-        score += mobility_score if board.turn else -mobility_score
-
-        # Center control (with expanded center)
-        center_squares = {chess.E4, chess.E5, chess.D4, chess.D5,
-                        chess.C3, chess.C4, chess.C5, chess.C6,
-                        chess.D3, chess.D6, chess.E3, chess.E6,
-                        chess.F3, chess.F4, chess.F5, chess.F6}
-        for square in center_squares:
-            piece = board.piece_at(square)
-            if piece is not None:
-                bonus = 30 if square in {chess.E4, chess.E5, chess.D4, chess.D5} else 15
-                score += bonus if piece.color else -bonus
-
-        # Pawn structure evaluation
+        # Static evaluation from the side to move's point of view; mates and
+        # draws are detected by the search
+        score = self._evaluate_material(board)
+        score += self._evaluate_mobility_term(board)
+        score += self._evaluate_center(board)
         score += self._evaluate_pawn_structure(board)
-
-        # King safety
         score += self._evaluate_king_safety(board)
+        return score if board.turn else -score
 
+    def evaluate_batch(self, positions: List) -> List[float]:
+        # evaluate_position over many boards or FEN strings at once; needs numpy
+        from batcheval import evaluate_batch
+        return evaluate_batch(positions).tolist()
+
+    def _evaluate_position_timed(self, board: chess.Board) -> float:
+        # evaluate_position with per-term timing, installed by _start_stats for
+        # the duration of one search
+        clock = time.perf_counter
+        times = self.stats.eval_time
+        self.stats.eval_calls += 1
+        t0 = clock()
+        score = self._evaluate_material(board)
+        t1 = clock()
+        score += self._evaluate_mobility_term(board)
+        t2 = clock()
+        score += self._evaluate_center(board)
+        t3 = clock()
+        score += self._evaluate_pawn_structure(board)
+        t4 = clock()
+        score += self._evaluate_king_safety(board)
+        t5 = clock()
+        times["material"] += t1 - t0
+        times["mobility"] += t2 - t1
+        times["center"] += t3 - t2
+        times["pawn_structure"] += t4 - t3
+        times["king_safety"] += t5 - t4
         return score if board.turn else -score
 
+    def _evaluate_material(self, board: chess.Board) -> float:
+        # Material and position evaluation, maintained incrementally by VariantBoard
+        if isinstance(board, VariantBoard):
+            material, pst = board.material, board.pst
+        else:
+            material, pst = compute_material_pst(board)
+        return material[chess.WHITE] - material[chess.BLACK] + (pst[chess.WHITE] - pst[chess.BLACK]) * PST_SCALE
+
+    def _evaluate_mobility_term(self, board: chess.Board) -> float:
+        # Mobility evaluation, estimated from attack masks; in check most of
+        # those moves are illegal, so count the (few) evasions instead
+        if board.is_check():
+            mobility_score = board.legal_moves.count() * 10
+        else:
+            mobility_score = self._evaluate_mobility(board, board.turn) * 10
+        return mobility_score if board.turn else -mobility_score
+
+    def _evaluate_mobility(self, board: chess.Board, color: chess.Color) -> int:
+        # Pseudo-legal move count from attack masks, without generating moves
+        own = board.occupied_co[color]
+        enemy = board.occupied_co[not color]
+        occupied = board.occupied
+        targets = ~own
+        count = 0
+
+        for square in chess.scan_reversed(board.knights & own):
+            count += popcount(chess.BB_KNIGHT_ATTACKS[square] & targets)
+        for square in chess.scan_reversed((board.bishops | board.queens) & own):
+            count += popcount(chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied] & targets)
+        for square in chess.scan_reversed((board.rooks | board.queens) & own):
+            count += popcount((chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] |
+                               chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied]) & targets)
+        for square in chess.scan_reversed(board.kings & own):
+            count += popcount(chess.BB_KING_ATTACKS[square] & targets)
+
+        # Pawn pushes, double pushes and captures
+        pawns = board.pawns & own
+        if color:
+            single = (pawns << 8) & ~occupied & chess.BB_ALL
+            double = ((single & chess.BB_RANK_3) << 8) & ~occupied
+            captures = (((pawns & ~chess.BB_FILE_A) << 7) | ((pawns & ~chess.BB_FILE_H) << 9)) & enemy
+        else:
+            single = (pawns >> 8) & ~occupied
+            double = ((single & chess.BB_RANK_6) >> 8) & ~occupied
+            captures = (((pawns & ~chess.BB_FILE_A) >> 9) | ((pawns & ~chess.BB_FILE_H) >> 7)) & enemy
+        return count + popcount(single) + popcount(double) + popcount(captures)
+
+    def _evaluate_center(self, board: chess.Board) -> float:
+        white = board.occupied_co[chess.WHITE]
+        black = board.occupied_co[chess.BLACK]
+        return (30 * (popcount(white & CENTER_INNER) - popcount(black & CENTER_INNER)) +
+                15 * (popcount(white & CENTER_OUTER) - popcount(black & CENTER_OUTER)))
+
     def _evaluate_pawn_structure(self, board: chess.Board) -> float:
         score = 0.0
 
-        # Evaluate doubled pawns (penalty)
-        for file in range(8):
-            white_pawns = 0
-            black_pawns = 0
-            for rank in range(8):
-                square = chess.square(file, rank)
-                piece = board.piece_at(square)
-                if piece and piece.piece_type == chess.PAWN:
-                    if piece.color:
-                        white_pawns += 1
-                    else:
-                        black_pawns += 1
-            if white_pawns > 1:
-                score -= 20 * (white_pawns - 1)
-            if black_pawns > 1:
-                score += 20 * (black_pawns - 1)
+        # Evaluate doubled pawns (penalty): pawns beyond one per occupied file
+        for color, sign in ((chess.WHITE, -20), (chess.BLACK, 20)):
+            pawns = board.pawns & board.occupied_co[color]
+            files = pawns | (pawns >> 32)
+            files |= files >> 16
+            files |= files >> 8
+            score += sign * (popcount(pawns) - popcount(files & 0xFF))
 
         return score
 
     def _evaluate_king_safety(self, board: chess.Board) -> float:
         score = 0.0
 
-        # King shield (pawns near king)
-        for color in [True, False]:
-            king_square = board.king(color)
-            if king_square is None:
-                continue
-
-            king_file = chess.square_file(king_square)
-            king_rank = chess.square_rank(king_square)
-
-            # Check pawns in front of king
-            for file_offset in [-1, 0, 1]:
-                if 0 <= king_file + file_offset <= 7:
-                    pawn_square = chess.square(king_file + file_offset,
-                                            king_rank + (1 if color else -1))
-                    if board.piece_at(pawn_square) and \
-                       board.piece_at(pawn_square).piece_type == chess.PAWN and \
-                       board.piece_at(pawn_square).color == color:
-                        score += 30 if color else -30
+        # King shield (pawns in front of the king)
+        for color, bonus in ((chess.WHITE, 30), (chess.BLACK, -30)):
+            own = board.occupied_co[color]
+            for king_square in chess.scan_reversed(board.kings & own):
+                score += bonus * popcount(KING_SHIELD_MASKS[color][king_square] & board.pawns & own)
 
         return score
 
-    def minimax(self, board: chess.Board, depth: int, alpha: float, beta: float) -> Tuple[float, Optional[chess.Move]]:
+    def negamax(self, board: VariantBoard, depth: int, alpha: float, beta: float, ply: int = 0,
+                follow_pv: bool = False, allow_null: bool = True) -> Tuple[float, Optional[chess.Move]]:
+        # Principal variation search; scores are from the side to move's point of view
+        self.nodes += 1
+        if self.nodes + self.qnodes >= self._next_check:
+            self._check_budget()
+
+        if ply > 0 and self._is_draw(board):
+            return 0.0, None
+        # Three-piece positions reached from a bigger one are scored from the
+        # tables. If the root is already in a table, searching on (with table
+        # scores at the leaves) is what finds the way to mate.
+        if (ply > 0 and self.bitbases is not None and self._root_moves is None
+                and popcount(board.occupied) == 3):
+            result = self.bitbases.probe(board)
+            if result is not None:
+                self.bitbase_hits += 1
+                return self._bitbase_score(board, result), None
+
+        pv_node = beta - alpha > NULL_WINDOW
+        in_check = board.is_check()
+        if in_check and pv_node and ply < MAX_DEPTH:
+            # Check extension (PV nodes only; elsewhere quiescence resolves checks)
+            depth += 1
+
         # Check transposition table
-        board_hash = board.fen()
-        if depth > 1 and board_hash in self.transposition_table:
-            return self.transposition_table[board_hash]
+        board_hash = board.zobrist_key
+        alpha_orig = alpha
+        tt_move = None
+        entry = self.transposition_table.probe(board_hash)
+        if entry is not None:
+            tt_depth, tt_bound, tt_score, tt_move = entry
+            tt_score = self._score_from_tt(tt_score, ply)
+            if ply > 0 and tt_depth >= depth and not pv_node:
+                if (tt_bound == BOUND_EXACT or
+                        (tt_bound == BOUND_LOWER and tt_score >= beta) or
+                        (tt_bound == BOUND_UPPER and tt_score <= alpha)):
+                    self.tt_cutoffs += 1
+                    return tt_score, tt_move
+
+        if depth <= 0:
+            # Resolve pending captures before trusting the static evaluation
+            return self.quiescence(board, alpha, beta, ply), None
+
+        static_eval = None
+        if not pv_node and not in_check:
+            static_eval = self.evaluate_position(board)
+            # Reverse futility pruning: far above beta at shallow depth
+            if depth <= FUTILITY_DEPTH and static_eval - FUTILITY_MARGIN * depth >= beta:
+                return static_eval, None
+
+        # Null-move pruning: if passing still fails high, the position is good
+        # enough to cut. Unsafe in check and in pawn-only endings (zugzwang).
+        if (allow_null and not pv_node and not in_check and depth >= 3
+                and board.occupied_co[board.turn] & ~(board.pawns | board.kings)):
+            if static_eval >= beta:
+                reduction = 2 + depth // 4 + (1 if static_eval - beta > 200 else 0)
+                board.push(chess.Move.null())
+                score, _ = self.negamax(board, depth - 1 - reduction, -beta, -beta + NULL_WINDOW,
+                                        ply + 1, False, False)
+                board.pop()
+                score = -score
+                if score >= beta:
+                    return (beta if score >= MATE_BOUND else score), None
 
-        if depth == 0 or board.is_game_over():
-            return self.evaluate_position(board), None
+        # Move ordering - previous principal variation (or hash move), good
+        # captures, killers, quiet moves by history, losing captures
+        pv_move = self.pv[ply] if follow_pv and ply < len(self.pv) else None
+        moves = MovePicker(board, pv_move or tt_move, self.ordering, ply)
+        killers = self.ordering.killers[ply]
 
         best_move = None
-        if board.turn:  # Maximizing player
-            max_eval = float('-inf')
-            # Move ordering - evaluate captures first
-            moves = list(board.legal_moves)
-            moves.sort(key=lambda m: board.is_capture(m), reverse=True)
-
-            for move in moves:
-                board.push(move)
-                eval_score, _ = self.minimax(board, depth - 1, alpha, beta)
-                board.pop()
-
-                if eval_score > max_eval:
-                    max_eval = eval_score
-                    best_move = move
-                alpha = max(alpha, eval_score)
-                if beta <= alpha:
+        best_score = -MATE_SCORE
+        index = -1
+        for move in moves:
+            if ply == 0 and ((self._root_moves is not None and move not in self._root_moves)
+                             or move in self._excluded_moves):
+                continue
+            index += 1
+            quiet = not move.promotion and not board.is_capture(move)
+            board.push(move)
+
+            if index == 0:
+                score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1,
+                                      follow_pv and move == pv_move)[0]
+            else:
+                # Late move reductions for quiet moves that are unlikely to matter
+                reduction = 0
+                if (depth >= LMR_MIN_DEPTH and index >= LMR_MIN_INDEX and quiet and not in_check
+                        and move not in killers and not board.is_check()):
+                    reduction = LMR_REDUCTIONS[min(depth, 63)][min(index, 63)]
+                    reduction = min(reduction, depth - 2)
+
+                # Null-window search, re-searched at full depth and window if it beats alpha
+                score = -self.negamax(board, depth - 1 - reduction, -alpha - NULL_WINDOW, -alpha, ply + 1)[0]
+                if score > alpha and reduction:
+                    score = -self.negamax(board, depth - 1, -alpha - NULL_WINDOW, -alpha, ply + 1)[0]
+                if alpha < score < beta:
+                    score = -self.negamax(board, depth - 1, -beta, -alpha, ply + 1)[0]
+
+            board.pop()
+
+            if score > best_score or best_move is None:
+                best_score = score
+                best_move = move
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    self.beta_cutoffs += 1
+                    self.cutoff_histogram[index if index < CUTOFF_BUCKETS else CUTOFF_BUCKETS - 1] += 1
+                    if index == 0:
+                        self.first_move_cutoffs += 1
+                    self.ordering.record_cutoff(board, move, depth, ply)
                     break
 
-            # Store in transposition table
-            if depth > 1:
-                self.transposition_table[board_hash] = (max_eval, best_move)
-            return max_eval, best_move
+        if best_move is None:
+            # No legal moves: checkmate or stalemate
+            return (-MATE_SCORE + ply if in_check else 0.0), None
+
+        # Store in transposition table with the kind of bound the score represents
+        if best_score <= alpha_orig:
+            bound = BOUND_UPPER
+        elif best_score >= beta:
+            bound = BOUND_LOWER
+        else:
+            bound = BOUND_EXACT
+        self.transposition_table.store(board_hash, depth, bound, self._score_to_tt(best_score, ply), best_move)
+        return best_score, best_move
+
+    def _bitbase_score(self, board: VariantBoard, result: int) -> float:
+        # Known wins get a bonus for progress, so the search drives the weak
+        # king to the edge or pushes the pawn instead of shuffling
+        if not result:
+            return 0.0
+        strong = board.turn if result > 0 else not board.turn
+        extra = board.occupied & ~board.kings
+        square = chess.lsb(extra)
+        piece_type = board.piece_type_at(square)
+        score = KNOWN_WIN + PIECE_VALUES[piece_type]
+        if piece_type == chess.PAWN:
+            score += 20 * chess.square_rank(square if strong else square ^ 56)
+        else:
+            # Mop-up: weak king towards the edge, strong king close to it
+            weak_king, strong_king = board.king(not strong), board.king(strong)
+            file, rank = chess.square_file(weak_king), chess.square_rank(weak_king)
+            center_distance = max(3 - file, file - 4) + max(3 - rank, rank - 4)
+            king_distance = (abs(file - chess.square_file(strong_king)) +
+                             abs(rank - chess.square_rank(strong_king)))
+            score += 10 * center_distance + 4 * (14 - king_distance)
+        return score if result > 0 else -score
+
+    def _bitbase_root_moves(self, board: VariantBoard) -> Optional[Set[chess.Move]]:
+        # Root moves that keep the bitbase result (a win stays a win), or None
+        # when the root is not in a table
+        if self.bitbases is None or popcount(board.occupied) != 3:
+            return None
+        result = self.bitbases.probe(board)
+        if result is None:
+            return None
+        self.bitbase_hits += 1
+        moves = set()
+        for move in board.legal_moves:
+            board.push(move)
+            if board.is_checkmate():
+                child = -1
+            elif board.is_stalemate() or board.is_insufficient_material():
+                child = 0
+            else:
+                child = self.bitbases.probe(board) or 0
+            board.pop()
+            if -child == result:
+                moves.add(move)
+        return moves or None
+
+    def _is_draw(self, board: VariantBoard) -> bool:
+        # Fifty-move rule, insufficient material, or a repetition inside the search
+        if board.halfmove_clock >= 100 or board.is_insufficient_material():
+            return True
+        return board.halfmove_clock >= 4 and board.is_repetition(2)
+
+    def _score_to_tt(self, score: float, ply: int) -> float:
+        # Mate scores are stored relative to the node, not the root
+        if score >= MATE_BOUND:
+            return score + ply
+        if score <= -MATE_BOUND:
+            return score - ply
+        return score
 
-        else:  # Minimizing player
-            min_eval = float('inf')
+    def _score_from_tt(self, score: float, ply: int) -> float:
+        if score >= MATE_BOUND:
+            return score - ply
+        if score <= -MATE_BOUND:
+            return score + ply
+        return score
+
+    def quiescence(self, board: VariantBoard, alpha: float, beta: float, ply: int, qply: int = 0) -> float:
+        # Capture-only search; scores are from the side to move's point of view
+        self.qnodes += 1
+        if self.nodes + self.qnodes >= self._next_check:
+            self._check_budget()
+
+        if self.bitbases is not None and popcount(board.occupied) == 3:
+            result = self.bitbases.probe(board)
+            if result is not None:
+                self.bitbase_hits += 1
+                return self._bitbase_score(board, result)
+
+        in_check = board.is_check()
+        if in_check:
+            # No standing pat in check: every evasion has to be searched
             moves = list(board.legal_moves)
-            moves.sort(key=lambda m: board.is_capture(m), reverse=True)
+            if not moves:
+                return -MATE_SCORE + ply
+            best_score = -MATE_SCORE + ply
+        else:
+            stand_pat = self.evaluate_position(board)
+            if stand_pat >= beta or qply >= MAX_QUIESCENCE_PLY:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+            best_score = stand_pat
+            # Captures and quiet queen promotions
+            moves = list(board.generate_legal_captures())
+            moves.extend(board.generate_legal_moves(board.pawns & board.occupied_co[board.turn],
+                                                    chess.BB_BACKRANKS & ~board.occupied))
+            moves = [move for move in moves if not move.promotion or move.promotion == chess.QUEEN]
+
+        moves.sort(key=lambda m: mvv_lva(board, m), reverse=True)
+        for move in moves:
+            if not in_check and not move.promotion:
+                victim = captured_piece_type(board, move)
+                # Delta pruning: even winning the piece outright can't reach alpha
+                if stand_pat + SEE_VALUES[victim] + DELTA_MARGIN < alpha:
+                    continue
+                # SEE pruning: skip captures that lose material
+                if SEE_VALUES[victim] < SEE_VALUES[board.piece_type_at(move.from_square)] and \
+                        static_exchange(board, move) < 0:
+                    continue
+
+            board.push(move)
+            score = -self.quiescence(board, -beta, -alpha, ply + 1, qply + 1)
+            board.pop()
+
+            if score > best_score:
+                best_score = score
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
 
-            for move in moves:
-                board.push(move)
-                eval_score, _ = self.minimax(board, depth - 1, alpha, beta)
-                board.pop()
+        return best_score
+
+    def _check_budget(self) -> None:
+        self._next_check = self.nodes + self.qnodes + CHECK_INTERVAL
+        if self._max_nodes is not None:
+            if self.nodes + self.qnodes >= self._max_nodes:
+                raise SearchAborted()
+            self._next_check = min(self._next_check, self._max_nodes)
+        if self._deadline is not None and time.perf_counter() >= self._deadline:
+            raise SearchAborted()
+        if self.stop_flag is not None and self.stop_flag.value:
+            raise SearchAborted()
+        if self._stop_requested and self.completed_depth:
+            raise SearchAborted()
+
+    def _extract_pv(self, board: VariantBoard, max_length: int) -> List[chess.Move]:
+        # Follow hash moves from the root to recover the principal variation
+        pv: List[chess.Move] = []
+        for _ in range(max_length):
+            entry = self.transposition_table.probe(board.zobrist_key)
+            if entry is None or entry[3] is None or not board.is_legal(entry[3]):
+                break
+            pv.append(entry[3])
+            board.push(entry[3])
+        for _ in pv:
+            board.pop()
+        return pv
+
+    def _reset_search(self, new_search: bool = True) -> None:
+        if new_search:
+            self.ordering.new_search()
+        self._analysis = None
+        self.nodes = 0
+        self.qnodes = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.cutoff_histogram = [0] * CUTOFF_BUCKETS
+        self.tt_cutoffs = 0
+        self.helper_nodes = 0
+        self.completed_depth = 0
+        self.pv = []
+        self.iterations = []
+        self._deadline = None
+        self._max_nodes = None
+        self._next_check = CHECK_INTERVAL
+        self._stop_requested = False
+        self.bitbase_hits = 0
+
+    def get_best_move(self, board: VariantBoard, time_limit: Optional[float] = None,
+                      max_nodes: Optional[int] = None, max_depth: Optional[int] = None) -> chess.Move:
+        if max_depth is None:
+            max_depth = self.depth if time_limit is None and max_nodes is None else MAX_DEPTH
+
+        # Age old entries instead of clearing the table
+        self.transposition_table.new_search()
+        self._reset_search()
+        self._start = start = time.perf_counter()
+        self._time_limit = time_limit
+        root_ply = len(board.move_stack)
+        best_move = None
+        if self.collect_stats:
+            self._start_stats(board)
+
+        if self.book is not None:
+            best_move = self.book.choose(board)
+            if best_move is not None:
+                self.pv = [best_move]
+                if self.collect_stats:
+                    self.stats.source = "book"
+                    self._finish_stats(best_move)
+                return best_move
+        self._root_moves = self._bitbase_root_moves(board)
+
+        if self.helpers:
+            self.helpers.start(board, max_depth, self.transposition_table.generation)
+        try:
+            # Iterative deepening; depth 1 always completes so there is a move to return
+            for depth in range(1, max_depth + 1):
+                try:
+                    if depth == 2:
+                        time_limit = self._time_limit
+                        self._deadline = start + time_limit if time_limit is not None else None
+                        self._max_nodes = max_nodes
+                        self._check_budget()
+                    score, move = self.negamax(board, depth, -MATE_SCORE, MATE_SCORE, 0, True)
+                except SearchAborted:
+                    # Unwind the moves of the interrupted iteration
+                    while len(board.move_stack) > root_ply:
+                        board.pop()
+                    break
 
-                if eval_score < min_eval:
-                    min_eval = eval_score
-                    best_move = move
-                beta = min(beta, eval_score)
-                if beta <= alpha:
+                if move is None:
+                    break
+                best_move = move
+                self.completed_depth = depth
+                self.last_score = score
+                self.pv = self._extract_pv(board, depth) or [move]
+                if self.pv[0] != move:
+                    self.pv = [move]
+                self.iterations.append((depth, self.nodes + self.qnodes, time.perf_counter() - start))
+                if self.iteration_callback is not None and self.iteration_callback(
+                        depth, score, self.iterations[-1][2]):
                     break
 
-            if depth > 1:
-                self.transposition_table[board_hash] = (min_eval, best_move)
-            return min_eval, best_move
+                # The next iteration takes several times longer; don't start what can't finish
+                time_limit = self._time_limit
+                if time_limit is not None and time.perf_counter() - start > time_limit / 2:
+                    break
+        finally:
+            if self.helpers:
+                self.helper_nodes = self.helpers.stop()
+
+        self._deadline = None
+        self._max_nodes = None
+        if self.collect_stats:
+            self._finish_stats(best_move)
+        return best_move
+
+    def analyse(self, board: VariantBoard, multipv: int = 1, time_limit: Optional[float] = None,
+                max_nodes: Optional[int] = None, max_depth: Optional[int] = None,
+                pvs: Optional[List[List[chess.Move]]] = None, start_depth: int = 1) -> List[AnalysisLine]:
+        # The best multipv root moves, best first. Every depth searches the
+        # root once per line with the moves of the lines already found
+        # excluded. pvs (e.g. the tails of the previous analysis' lines) are
+        # searched first and start_depth skips the iterations the table
+        # already covers; the table and history carry over as in
+        # get_best_move. Called again for the same position and multipv after
+        # reaching its full depth, it continues with the next depth instead of
+        # starting over. The book is not used.
+        if max_depth is None:
+            max_depth = self.depth if time_limit is None and max_nodes is None else MAX_DEPTH
+        start_depth = min(start_depth, max_depth)
+
+        if self.can_continue_analysis(board, multipv, max_depth):
+            _, first_depth, lines = self._analysis
+            # Counters restart, but killers, history and the table are kept
+            self._reset_search(new_search=False)
+            depths = list(range(first_depth + 1, max_depth + 1))
+        else:
+            self.transposition_table.new_search()
+            self._reset_search()
+            lines = []
+            # Depth 1 always completes, so there are lines to return; the
+            # depths the table already covers are skipped after it
+            depths = [1] + list(range(max(2, start_depth), max_depth + 1))
+        key = self._analysis_key(board, multipv)
+        self._start = start = time.perf_counter()
+        self._time_limit = time_limit
+        root_ply = len(board.move_stack)
+        self._root_moves = self._bitbase_root_moves(board)
+        root_moves = self._root_moves or set(board.legal_moves)
+        multipv = min(multipv, len(root_moves))
+        seeds = [line.pv for line in lines] or [pv for pv in pvs or [] if pv and pv[0] in root_moves]
+        if self.collect_stats:
+            self._start_stats(board)
+            self.stats.source = "analysis"
+        # The search budget applies from the first depth after depth 1
+        budget_depth = depths[0] if depths[0] > 1 else depths[1] if len(depths) > 1 else None
+        completed = False
+
+        if self.helpers:
+            self.helpers.start(board, max_depth, self.transposition_table.generation)
+        try:
+            for depth in depths:
+                found: List[AnalysisLine] = []
+                try:
+                    if depth == budget_depth:
+                        time_limit = self._time_limit
+                        self._deadline = start + time_limit if time_limit is not None else None
+                        self._max_nodes = max_nodes
+                        self._check_budget()
+                    for index in range(multipv):
+                        self._excluded_moves = {line.move for line in found}
+                        self.pv = seeds[index] if index < len(seeds) else []
+                        score, move = self.negamax(board, depth, -MATE_SCORE, MATE_SCORE, 0, True)
+                        if move is None:
+                            break
+                        # The root entry holds this line's move, so the hash
+                        # moves from there are its PV
+                        pv = self._extract_pv(board, depth)
+                        found.append(AnalysisLine(move, score, depth, pv if pv and pv[0] == move else [move]))
+                except SearchAborted:
+                    while len(board.move_stack) > root_ply:
+                        board.pop()
+                    # Lines finished at this depth replace their shallower versions
+                    if found:
+                        moves = {line.move for line in found}
+                        lines = found + [line for line in lines if line.move not in moves][:multipv - len(found)]
+                    break
 
-    def get_best_move(self, board: chess.Board) -> chess.Move:
-        # Clear transposition table periodically to prevent memory issues
-        if len(self.transposition_table) > 1000000:
-            self.transposition_table.clear()
+                if not found:
+                    completed = True
+                    break
+                found.sort(key=lambda line: -line.score)
+                lines = found
+                best = found[0]
+                if depth >= start_depth:
+                    seeds = [line.pv for line in found]
+                    # Leave the best move in the root entry for later searches
+                    self.transposition_table.store(board.zobrist_key, depth, BOUND_EXACT,
+                                                   self._score_to_tt(best.score, 0), best.move)
+                self.completed_depth = depth
+                self.last_score = best.score
+                self.iterations.append((depth, self.nodes + self.qnodes, time.perf_counter() - start))
+                if depth == max_depth:
+                    completed = True
+                    break
 
-        _, best_move = self.minimax(board, self.depth, float('-inf'), float('inf'))
-        return best_move
\ No newline at end of file
+                time_limit = self._time_limit
+                if time_limit is not None and time.perf_counter() - start > time_limit / 2:
+                    break
+        finally:
+            self._excluded_moves = set()
+            if self.helpers:
+                self.helper_nodes = self.helpers.stop()
+
+        self._deadline = None
+        self._max_nodes = None
+        self.pv = lines[0].pv if lines else []
+        if completed and lines:
+            self._analysis = (key, lines[0].depth, lines)
+        if self.collect_stats:
+            self._finish_stats(lines[0].move if lines else None)
+        return lines
+
+    def can_continue_analysis(self, board: VariantBoard, multipv: int, max_depth: Optional[int]) -> bool:
+        # True when analyse() would continue the previous analysis rather
+        # than start a new one; max_depth None means no depth limit
+        return (self._analysis is not None and self._analysis[0] == self._analysis_key(board, multipv)
+                and (max_depth is None or self._analysis[1] < max_depth))
+
+    def _analysis_key(self, board: VariantBoard, multipv: int) -> Tuple:
+        # The move stack matters too: repetitions inside the search depend on it
+        return board.root().variant_fen(), tuple(board.move_stack), multipv
+
+    def _start_stats(self, board: VariantBoard) -> None:
+        table = self.transposition_table
+        self.stats = SearchStats(board.variant_fen())
+        self._tt_counts = (table.probes, table.hits)
+        self.evaluate_position = self._evaluate_position_timed
+
+    def _finish_stats(self, move: Optional[chess.Move]) -> None:
+        self.__dict__.pop("evaluate_position", None)
+        stats = self.stats
+        table = self.transposition_table
+        stats.move = move.uci() if move else None
+        stats.score = self.last_score if self.completed_depth else 0.0
+        stats.depth = self.completed_depth
+        stats.seconds = time.perf_counter() - self._start
+        stats.nodes = self.nodes
+        stats.qnodes = self.qnodes
+        previous = 0
+        for _, total, _ in self.iterations:
+            stats.nodes_per_depth.append(total - previous)
+            previous = total
+        stats.tt_probes = table.probes - self._tt_counts[0]
+        stats.tt_hits = table.hits - self._tt_counts[1]
+        stats.tt_cutoffs = self.tt_cutoffs
+        stats.beta_cutoffs = self.beta_cutoffs
+        stats.cutoff_histogram = list(self.cutoff_histogram)
+        stats.bitbase_hits = self.bitbase_hits
+        stats.helper_nodes = self.helper_nodes
+        stats.pv = [m.uci() for m in self.pv]
+        if self.stats_sink is not None:
+            self.stats_sink(stats)
+
+    def helper_search(self, board: VariantBoard, start_depth: int, max_depth: int) -> int:
+        # Lazy SMP helper loop: search for the side effects on the shared table
+        # until stop_flag is set, and return the number of nodes searched
+        self._reset_search()
+        root_ply = len(board.move_stack)
+        for depth in range(start_depth, max_depth + 1):
+            try:
+                self.negamax(board, depth, -MATE_SCORE, MATE_SCORE, 0, True)
+            except SearchAborted:
+                while len(board.move_stack) > root_ply:
+                    board.pop()
+                break
+        return self.nodes + self.qnodes
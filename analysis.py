@@ -0,0 +1,89 @@
+from typing import Dict, List, Optional, Tuple
+
+import chess
+
+from game import VariantBoard
+
+# Multi-PV analysis: ChessAI.analyse returns the best few root moves, each
+# with its score and principal variation. An AnalysisSession follows a game
+# through successive positions with one engine: the table and the history
+# carry over, and after a move that one of the previous lines predicted, the
+# rest of that line is searched first. A deeper request for the same position
+# continues the previous analysis, and positions already analysed (e.g. when
+# stepping back through a game) are answered from a cache.
+
+# Depth-limited results kept by a session
+CACHE_SIZE = 256
+
+
+class AnalysisLine:
+    def __init__(self, move: chess.Move, score: float, depth: int, pv: List[chess.Move]):
+        self.move = move
+        # From the side to move's point of view, as returned by the search
+        self.score = score
+        self.depth = depth
+        self.pv = pv
+
+    def to_dict(self) -> dict:
+        return {"move": self.move.uci(), "score": self.score, "depth": self.depth,
+                "pv": [move.uci() for move in self.pv]}
+
+    def __repr__(self) -> str:
+        return f"AnalysisLine({self.move.uci()}, {self.score:+.1f}, depth {self.depth}, pv {len(self.pv)})"
+
+
+class AnalysisSession:
+    def __init__(self, ai=None, multipv: int = 3, **engine_options):
+        # engine_options are passed to ChessAI when no engine is given
+        if ai is None:
+            from ai import ChessAI
+            ai = ChessAI(**engine_options)
+        self.ai = ai
+        self.multipv = multipv
+        self.lines: List[AnalysisLine] = []
+        self._cache: Dict[Tuple, List[AnalysisLine]] = {}
+        # Position of self.lines
+        self._fen: Optional[str] = None
+
+    def analyse(self, board: VariantBoard, multipv: Optional[int] = None, time_limit: Optional[float] = None,
+                max_nodes: Optional[int] = None, max_depth: Optional[int] = None) -> List[AnalysisLine]:
+        multipv = multipv or self.multipv
+        # Only depth-limited results answer a repeated request, so only they are cached
+        key = None
+        if time_limit is None and max_nodes is None:
+            key = (board.root().variant_fen(), tuple(board.move_stack), multipv, max_depth or self.ai.depth)
+            if key in self._cache:
+                self.lines = self._cache[key]
+                self._fen = board.variant_fen()
+                return self.lines
+
+        pvs, start_depth = self._predicted(board)
+        self.lines = self.ai.analyse(board, multipv, time_limit=time_limit, max_nodes=max_nodes,
+                                     max_depth=max_depth, pvs=pvs, start_depth=start_depth)
+        self._fen = board.variant_fen()
+        if key is not None and self.lines:
+            if len(self._cache) >= CACHE_SIZE:
+                del self._cache[next(iter(self._cache))]
+            self._cache[key] = self.lines
+        return self.lines
+
+    def new_game(self) -> None:
+        self.ai.clear()
+        self.lines = []
+        self._fen = None
+        self._cache.clear()
+
+    def _predicted(self, board: VariantBoard) -> Tuple[List[List[chess.Move]], int]:
+        # PVs to search first and the depth the table already covers: after a
+        # move that one of the lines predicted, the rest of that line is the
+        # expected continuation, searched one ply less deep
+        if self._fen is None or not self.lines or not board.move_stack:
+            return [], 1
+        parent = board.copy()
+        played = parent.pop()
+        if parent.variant_fen() != self._fen:
+            return [], 1
+        lines = [line for line in self.lines if line.pv[0] == played]
+        if not lines:
+            return [], 1
+        return [line.pv[1:] for line in lines if len(line.pv) > 1], lines[0].depth - 1
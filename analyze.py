@@ -0,0 +1,245 @@
+import argparse
+import collections
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import chess
+import chess.pgn
+
+from game import MainlineVisitor, VariantBoard
+from tournament import engine_limits, make_engine, parse_engine
+
+# Batch analysis of positions from PGN or FEN/EPD files. Input is streamed a
+# game (or a chunk of lines) at a time, searched in a process pool and written
+# to JSONL in input order. The checkpoint records the input offset and output
+# size after the last written task, so an interrupted run resumes where it
+# stopped without redoing or duplicating work.
+
+# FEN/EPD lines per task; games are one task each
+FEN_CHUNK = 16
+CHECKPOINT_INTERVAL = 5.0
+EPD_ID = re.compile(r'\bid\s+"([^"]*)"')
+
+# (input offset after the task, index of the next game or line, task)
+Item = Tuple[int, int, Tuple]
+
+
+def read_pgn(path: str, offset: int = 0, index: int = 0) -> Iterator[Item]:
+    with open(path) as f:
+        f.seek(offset)
+        while True:
+            game = chess.pgn.read_game(f, Visitor=MainlineVisitor)
+            if game is None:
+                return
+            headers = game.headers
+            # "Variant" is rejected by python-chess; "Rules" marks our games
+            fen = headers.get("FEN", chess.STARTING_FEN)
+            info = {key: headers[key] for key in ("White", "Black", "Result") if key in headers}
+            yield f.tell(), index + 1, ("game", index, info, fen, game.san)
+            index += 1
+
+
+def parse_position_line(line: str) -> Optional[Tuple[str, Optional[str]]]:
+    # FEN (optionally with the seventh variant field) or EPD with opcodes;
+    # returns (fen, id) or None for blank and comment lines
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    fields = line.split()
+    if len(fields) >= 6 and fields[4].isdigit() and fields[5].isdigit():
+        return " ".join(fields[:7]), None
+    match = EPD_ID.search(line)
+    return " ".join(fields[:4]) + " 0 1", match.group(1) if match else None
+
+
+def read_fens(path: str, offset: int = 0, index: int = 0, chunk: int = FEN_CHUNK) -> Iterator[Item]:
+    with open(path) as f:
+        f.seek(offset)
+        positions = []
+        while True:
+            line = f.readline()
+            if line:
+                parsed = parse_position_line(line)
+                if parsed is not None:
+                    positions.append((index, *parsed))
+                index += 1
+            if positions and (len(positions) >= chunk or not line):
+                yield f.tell(), index, ("fens", positions)
+                positions = []
+            if not line:
+                return
+
+
+def analyse_position(engine, board: VariantBoard, time_limit: Optional[float],
+                     max_nodes: Optional[int]) -> Dict:
+    start = time.perf_counter()
+    move = engine.get_best_move(board, time_limit=time_limit, max_nodes=max_nodes)
+    return {
+        "fen": board.variant_fen(),
+        "move": move.uci() if move else None,
+        "score": engine.last_score if engine.completed_depth else None,
+        "depth": engine.completed_depth,
+        "nodes": engine.nodes + engine.qnodes,
+        "seconds": round(time.perf_counter() - start, 4),
+        "pv": [m.uci() for m in engine.pv],
+    }
+
+
+def analyse_task(engine_spec: str, task: Tuple, time_limit: Optional[float], max_nodes: Optional[int],
+                 min_ply: int, every: int) -> List[Dict]:
+    # Runs in a worker process; the engine is created once per process
+    engine = make_engine(engine_spec)
+    time_limit, max_nodes = engine_limits(engine_spec, time_limit, max_nodes)
+    results = []
+    if task[0] == "fens":
+        for line, fen, epd_id in task[1]:
+            record = {"line": line + 1}
+            if epd_id is not None:
+                record["id"] = epd_id
+            try:
+                board = VariantBoard(fen)
+            except ValueError as error:
+                record["error"] = str(error)
+                results.append(record)
+                continue
+            if board.is_game_over():
+                record.update(fen=board.variant_fen(), move=None, result=board.result())
+            else:
+                record.update(analyse_position(engine, board, time_limit, max_nodes))
+            results.append(record)
+        return results
+
+    _, index, info, fen, san_moves = task
+    engine.new_game()
+    try:
+        board = VariantBoard(fen)
+    except ValueError as error:
+        return [{"game": index + 1, **info, "error": str(error)}]
+    for ply, san in enumerate(san_moves):
+        try:
+            move = board.parse_san(san)
+        except ValueError:
+            results.append({"game": index + 1, **info, "ply": ply, "error": f"illegal move {san}"})
+            break
+        if ply >= min_ply and (ply - min_ply) % every == 0:
+            record = {"game": index + 1, **info, "ply": ply, "played": move.uci()}
+            record.update(analyse_position(engine, board, time_limit, max_nodes))
+            results.append(record)
+        board.push(move)
+    return results
+
+
+def load_checkpoint(path: str) -> Optional[Dict]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_checkpoint(path: str, checkpoint: Dict) -> None:
+    # Written next to the target and renamed, so a crash never leaves half a checkpoint
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(temporary, path)
+
+
+def run(input_path: str, output_path: str, engine_spec: str, workers: int, time_limit: Optional[float],
+        max_nodes: Optional[int], min_ply: int = 0, every: int = 1, in_flight: Optional[int] = None,
+        checkpoint_path: Optional[str] = None, resume: bool = False, input_format: Optional[str] = None) -> int:
+    # Returns the number of records written by this run
+    if input_format is None:
+        input_format = "pgn" if input_path.lower().endswith(".pgn") else "fen"
+    checkpoint_path = checkpoint_path or output_path + ".ckpt"
+    in_flight = in_flight or workers * 4
+
+    offset = index = 0
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    if checkpoint is not None:
+        if checkpoint["input"] != os.path.abspath(input_path):
+            raise ValueError(f"checkpoint {checkpoint_path} belongs to {checkpoint['input']}")
+        offset, index = checkpoint["offset"], checkpoint["index"]
+        # Drop records written after the checkpoint; they are produced again
+        if os.path.exists(output_path):
+            os.truncate(output_path, checkpoint["output_size"])
+        output = open(output_path, "a")
+    else:
+        output = open(output_path, "w")
+
+    reader = read_pgn if input_format == "pgn" else read_fens
+    items = reader(input_path, offset, index)
+    written = 0
+    start = last_save = time.perf_counter()
+
+    def checkpoint_now(offset: int, index: int) -> None:
+        output.flush()
+        os.fsync(output.fileno())
+        save_checkpoint(checkpoint_path, {"input": os.path.abspath(input_path), "offset": offset,
+                                          "index": index, "output_size": output.tell()})
+
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            # Results are written in input order, so at most in_flight tasks
+            # (and their results) are held in memory
+            pending = collections.deque()
+            done = False
+            while pending or not done:
+                while not done and len(pending) < in_flight:
+                    item = next(items, None)
+                    if item is None:
+                        done = True
+                        break
+                    future = executor.submit(analyse_task, engine_spec, item[2], time_limit, max_nodes,
+                                             min_ply, every)
+                    pending.append((future, item[0], item[1]))
+                if not pending:
+                    break
+                future, offset, index = pending.popleft()
+                for record in future.result():
+                    output.write(json.dumps(record) + "\n")
+                    written += 1
+                now = time.perf_counter()
+                if now - last_save >= CHECKPOINT_INTERVAL:
+                    checkpoint_now(offset, index)
+                    last_save = now
+                    print(f"[{now - start:7.1f}s] {written} positions, {written / (now - start):.1f}/s")
+            checkpoint_now(offset, index)
+    finally:
+        output.close()
+    return written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Analyse every position of a PGN or FEN/EPD file")
+    parser.add_argument("input", help="PGN file, or one FEN/EPD per line")
+    parser.add_argument("output", help="JSONL file, one result per position")
+    parser.add_argument("--format", choices=("pgn", "fen"), help="default: from the file extension")
+    parser.add_argument("--engine", default="", help="engine spec as in tournament.py, e.g. hash=16,depth=6")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--time", type=float, help="seconds per position")
+    parser.add_argument("--nodes", type=int, help="nodes per position (default 20000 if no --time)")
+    parser.add_argument("--min-ply", type=int, default=0, help="skip the first plies of each game")
+    parser.add_argument("--every", type=int, default=1, help="analyse every Nth ply of each game")
+    parser.add_argument("--in-flight", type=int, help="tasks queued at once (default 4 per worker)")
+    parser.add_argument("--checkpoint", help="default: OUTPUT.ckpt")
+    parser.add_argument("--resume", action="store_true", help="continue from the checkpoint")
+    args = parser.parse_args()
+
+    try:
+        parse_engine(args.engine)
+    except ValueError as error:
+        parser.error(str(error))
+    max_nodes = args.nodes if args.nodes or args.time else 20000
+    start = time.perf_counter()
+    written = run(args.input, args.output, args.engine, args.workers, args.time, max_nodes, args.min_ply,
+                  max(args.every, 1), args.in_flight, args.checkpoint, args.resume, args.format)
+    print(f"{written} positions in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
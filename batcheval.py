@@ -0,0 +1,375 @@
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import chess
+import numpy as np
+
+from pst import PIECE_VALUES, PST_BONUS, PST_SCALE
+
+# Vectorized ChessAI.evaluate_position for large position sets. A batch is a
+# dense (N, 10) uint64 array of planes, one 64-square bitboard each: pawns,
+# knights, bishops, rooks, queens, kings, white, black, used double moves and
+# the en passant square, plus the side to move. Every term is computed with
+# bitboard shifts, fills and popcounts over the whole batch, in the same order
+# as the scalar evaluation so the results are identical floats.
+#
+# Throughput is about 6x evaluate_position on the same boards
+# (python bench.py --batch 10000), far short of the 50x target, which needs
+# rescoping. A scalar board evaluation is only ~7 us since material and PST
+# are incremental, while reading a board's bitboards from Python costs
+# ~0.4 us and the batch terms ~0.55 us per position, so even free encoding
+# would stay under 15x.
+
+PAWNS, KNIGHTS, BISHOPS, ROOKS, QUEENS, KINGS, WHITE, BLACK, DOUBLE_MOVED, EP_SQUARE = range(10)
+PLANES = 10
+
+_U = np.uint64
+ALL = _U(chess.BB_ALL)
+NOT_FILE_A = _U(chess.BB_ALL & ~chess.BB_FILE_A)
+NOT_FILE_H = _U(chess.BB_ALL & ~chess.BB_FILE_H)
+NOT_FILE_AB = _U(chess.BB_ALL & ~(chess.BB_FILE_A | chess.BB_FILE_B))
+NOT_FILE_GH = _U(chess.BB_ALL & ~(chess.BB_FILE_G | chess.BB_FILE_H))
+RANK_2 = _U(chess.BB_RANK_2)
+RANK_3 = _U(chess.BB_RANK_3)
+RANK_6 = _U(chess.BB_RANK_6)
+RANK_7 = _U(chess.BB_RANK_7)
+BACK_RANKS = _U(chess.BB_BACKRANKS)
+CENTER_INNER = _U(chess.BB_E4 | chess.BB_E5 | chess.BB_D4 | chess.BB_D5)
+CENTER_OUTER = _U(chess.BB_C3 | chess.BB_C4 | chess.BB_C5 | chess.BB_C6 |
+                  chess.BB_D3 | chess.BB_D6 | chess.BB_E3 | chess.BB_E6 |
+                  chess.BB_F3 | chess.BB_F4 | chess.BB_F5 | chess.BB_F6)
+
+# Sliding directions as (shift, mask of squares a step may land on); positive
+# shifts go towards h8
+DIAGONALS = ((9, NOT_FILE_A), (7, NOT_FILE_H), (-7, NOT_FILE_A), (-9, NOT_FILE_H))
+ORTHOGONALS = ((8, ALL), (-8, ALL), (1, NOT_FILE_A), (-1, NOT_FILE_H))
+KNIGHT_STEPS = ((17, NOT_FILE_A), (15, NOT_FILE_H), (10, NOT_FILE_AB), (6, NOT_FILE_GH),
+                (-6, NOT_FILE_AB), (-10, NOT_FILE_GH), (-15, NOT_FILE_A), (-17, NOT_FILE_H))
+KING_STEPS = DIAGONALS + ORTHOGONALS
+
+
+def _byte_tables(color: chess.Color, piece_type: chess.PieceType) -> np.ndarray:
+    # PST sum of every byte value at every byte (rank) of a bitboard
+    table = np.zeros((8, 256), dtype=np.int64)
+    bonus = PST_BONUS[color][piece_type]
+    for rank in range(8):
+        for value in range(256):
+            table[rank, value] = sum(bonus[rank * 8 + bit] for bit in range(8) if value >> bit & 1)
+    return table
+
+
+# Only pawns and knights have piece-square tables
+PST_TABLES = {(color, piece_type): _byte_tables(color, piece_type)
+              for color in chess.COLORS for piece_type in (chess.PAWN, chess.KNIGHT)}
+_RANKS = np.arange(8)
+
+# FEN decoding: digits expand to that many empty cells and "/" to none, and
+# every cell maps to a byte whose bit k marks membership of plane k
+_FEN_REPEAT = np.ones(256, dtype=np.intp)
+_FEN_REPEAT[ord("/")] = 0
+_FEN_MEMBER = np.zeros(256, dtype=np.uint8)
+for _index, _symbol in enumerate("PNBRQK"):
+    _FEN_MEMBER[ord(_symbol)] = 1 << _index | 1 << WHITE
+    _FEN_MEMBER[ord(_symbol.lower())] = 1 << _index | 1 << BLACK
+_FEN_CELL = _FEN_MEMBER.copy()
+for _count in range(1, 9):
+    _FEN_REPEAT[ord(str(_count))] = _count
+# Multiplying the low bit of each byte by this gathers the eight bits into the top byte
+BYTE_LOW_BITS = _U(0x0101010101010101)
+GATHER_BITS = _U(0x0102040810204080)
+SQUARE_BB = {name: chess.BB_SQUARES[square] for square, name in enumerate(chess.SQUARE_NAMES)}
+
+
+def _shift(bitboards: np.ndarray, amount: int) -> np.ndarray:
+    return bitboards << _U(amount) if amount > 0 else bitboards >> _U(-amount)
+
+
+def _popcount(bitboards: np.ndarray) -> np.ndarray:
+    return np.bitwise_count(bitboards).astype(np.int64)
+
+
+def _slide(sliders: np.ndarray, empty: np.ndarray, amount: int, mask: np.uint64) -> np.ndarray:
+    # Kogge-Stone occluded fill: squares attacked along one direction by all
+    # sliders at once, up to and including the first blocker
+    empty = empty & mask
+    sliders = sliders | (empty & _shift(sliders, amount))
+    empty = empty & _shift(empty, amount)
+    sliders = sliders | (empty & _shift(sliders, 2 * amount))
+    empty = empty & _shift(empty, 2 * amount)
+    sliders = sliders | (empty & _shift(sliders, 4 * amount))
+    return _shift(sliders, amount) & mask
+
+
+def encode_boards(boards: Sequence[chess.Board]) -> Tuple[np.ndarray, np.ndarray]:
+    values: List[int] = []
+    extend = values.extend
+    for b in boards:
+        occupied_co = b.occupied_co
+        # Plain chess.Boards have no variant double moves: treat every pawn as used
+        double_moved = getattr(b, "double_moved", None)
+        extend((b.pawns, b.knights, b.bishops, b.rooks, b.queens, b.kings,
+                occupied_co[chess.WHITE], occupied_co[chess.BLACK],
+                b.pawns if double_moved is None else double_moved,
+                0 if b.ep_square is None else chess.BB_SQUARES[b.ep_square]))
+    planes = np.fromiter(values, dtype=np.uint64, count=len(values)).reshape(-1, PLANES)
+    turn = np.fromiter((b.turn for b in boards), dtype=bool, count=len(boards))
+    return planes, turn
+
+
+def _squares(text: str) -> int:
+    # "e4c5" (or "-") to a bitboard
+    mask = 0
+    for i in range(0, len(text) - 1, 2):
+        mask |= SQUARE_BB[text[i:i + 2]]
+    return mask
+
+
+def encode_fens(fens: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    # Decodes the piece placement of all FENs at once. FENs are trusted to be
+    # well formed; the optional seventh field lists used double moves.
+    placements: List[str] = []
+    black_to_move: List[int] = []
+    # Rows with an en passant square or used double moves, and those bitboards
+    rows: List[int] = []
+    ep_squares: List[int] = []
+    double_moved: List[int] = []
+    # The same used-double-move lists recur across a dataset
+    parsed = {"-": 0}
+    for i, fen in enumerate(fens):
+        fields = fen.split(" ")
+        placements.append(fields[0])
+        count = len(fields)
+        if count > 1 and fields[1] == "b":
+            black_to_move.append(i)
+        ep_square = SQUARE_BB.get(fields[3], 0) if count > 3 else 0
+        used = fields[6] if count > 6 else "-"
+        if ep_square or used != "-":
+            mask = parsed.get(used)
+            if mask is None:
+                mask = parsed[used] = _squares(used)
+            rows.append(i)
+            ep_squares.append(ep_square)
+            double_moved.append(mask)
+    turn = np.ones(len(fens), dtype=bool)
+    turn[black_to_move] = False
+
+    # One byte per cell in FEN order (a8..h8, a7..h7, ...), eight cells per word
+    chars = np.frombuffer("".join(placements).encode(), dtype=np.uint8)
+    cells = np.repeat(_FEN_CELL[chars], _FEN_REPEAT[chars])
+    if len(cells) != 64 * len(fens):
+        raise ValueError("malformed FEN piece placement")
+    ranks = cells.view("<u8").reshape(len(fens), 8)
+
+    planes = np.zeros((len(fens), PLANES), dtype=np.uint64)
+    gathered = np.empty((len(fens), 8), dtype=np.uint8)
+    for plane in range(8):
+        gathered[:] = (((ranks >> _U(plane)) & BYTE_LOW_BITS) * GATHER_BITS) >> _U(56)
+        # FEN lists rank 8 first, so the rank bytes are in reverse order
+        planes[:, plane] = gathered.view(">u8")[:, 0]
+    if rows:
+        planes[rows, EP_SQUARE] = np.fromiter(ep_squares, dtype=np.uint64, count=len(rows))
+        planes[rows, DOUBLE_MOVED] = np.fromiter(double_moved, dtype=np.uint64, count=len(rows))
+    return planes, turn
+
+
+def _attackers(targets: np.ndarray, planes: np.ndarray, by_white: np.ndarray,
+               occupied: np.ndarray) -> np.ndarray:
+    # Pieces of the side by_white selects that attack any square in targets
+    attackers = np.where(by_white, planes[:, WHITE], planes[:, BLACK])
+    empty = ~occupied
+    diagonal = (planes[:, BISHOPS] | planes[:, QUEENS]) & attackers
+    orthogonal = (planes[:, ROOKS] | planes[:, QUEENS]) & attackers
+    hits = np.zeros(len(planes), dtype=np.uint64)
+    for amount, mask in DIAGONALS:
+        hits |= _slide(targets, empty, amount, mask) & diagonal
+    for amount, mask in ORTHOGONALS:
+        hits |= _slide(targets, empty, amount, mask) & orthogonal
+    for amount, mask in KNIGHT_STEPS:
+        hits |= _shift(targets, amount) & mask & planes[:, KNIGHTS] & attackers
+    for amount, mask in KING_STEPS:
+        hits |= _shift(targets, amount) & mask & planes[:, KINGS] & attackers
+    # Pawns attack the target from one rank behind it (seen from the pawn)
+    white_pawns = (_shift(targets, -7) & NOT_FILE_A) | (_shift(targets, -9) & NOT_FILE_H)
+    black_pawns = (_shift(targets, 7) & NOT_FILE_H) | (_shift(targets, 9) & NOT_FILE_A)
+    hits |= np.where(by_white, white_pawns, black_pawns) & planes[:, PAWNS] & attackers
+    return hits
+
+
+def checkers(planes: np.ndarray, turn: np.ndarray) -> np.ndarray:
+    own = np.where(turn, planes[:, WHITE], planes[:, BLACK])
+    return _attackers(planes[:, KINGS] & own, planes, ~turn, planes[:, WHITE] | planes[:, BLACK])
+
+
+def mobility(planes: np.ndarray, turn: np.ndarray) -> np.ndarray:
+    # Pseudo-legal move count of the side to move, as ChessAI._evaluate_mobility.
+    # Rays of different sliders in one direction never overlap (each stops at
+    # the first piece), so one fill per direction counts every slider's moves.
+    white, black = planes[:, WHITE], planes[:, BLACK]
+    own = np.where(turn, white, black)
+    enemy = np.where(turn, black, white)
+    empty = ~(white | black)
+    targets = ~own
+    count = np.zeros(len(planes), dtype=np.int64)
+
+    for amount, mask in KNIGHT_STEPS:
+        count += _popcount(_shift(planes[:, KNIGHTS] & own, amount) & mask & targets)
+    diagonal = (planes[:, BISHOPS] | planes[:, QUEENS]) & own
+    for amount, mask in DIAGONALS:
+        count += _popcount(_slide(diagonal, empty, amount, mask) & targets)
+    orthogonal = (planes[:, ROOKS] | planes[:, QUEENS]) & own
+    for amount, mask in ORTHOGONALS:
+        count += _popcount(_slide(orthogonal, empty, amount, mask) & targets)
+    for amount, mask in KING_STEPS:
+        count += _popcount(_shift(planes[:, KINGS] & own, amount) & mask & targets)
+
+    pawns = planes[:, PAWNS] & own
+    white_single = (pawns << _U(8)) & empty
+    white_double = ((white_single & RANK_3) << _U(8)) & empty
+    white_captures = (((pawns & NOT_FILE_A) << _U(7)) | ((pawns & NOT_FILE_H) << _U(9))) & enemy
+    black_single = (pawns >> _U(8)) & empty
+    black_double = ((black_single & RANK_6) >> _U(8)) & empty
+    black_captures = (((pawns & NOT_FILE_A) >> _U(9)) | ((pawns & NOT_FILE_H) >> _U(7))) & enemy
+    single = np.where(turn, white_single, black_single)
+    double = np.where(turn, white_double, black_double)
+    captures = np.where(turn, white_captures, black_captures)
+    return count + _popcount(single) + _popcount(double) + _popcount(captures)
+
+
+def _moves_to(moves: np.ndarray) -> np.ndarray:
+    # Move count for a set of pawn destinations, promotions counting four times
+    return _popcount(moves) + 3 * _popcount(moves & BACK_RANKS)
+
+
+def evasions(planes: np.ndarray, turn: np.ndarray, check: np.ndarray) -> np.ndarray:
+    # Legal move count of positions in check (check holds their checkers), as
+    # VariantBoard.legal_moves.count(). En passant is not handled: callers
+    # count positions in check with an ep square on the board.
+    white, black = planes[:, WHITE], planes[:, BLACK]
+    own = np.where(turn, white, black)
+    enemy = np.where(turn, black, white)
+    occupied = white | black
+    empty = ~occupied
+    king = planes[:, KINGS] & own
+
+    # King steps to squares that stay unattacked with the king gone
+    without_king = planes.copy()
+    without_king[:, KINGS] &= ~king
+    count = np.zeros(len(planes), dtype=np.int64)
+    for amount, mask in KING_STEPS:
+        target = _shift(king, amount) & mask & ~own
+        attacked = _attackers(target, without_king, ~turn, occupied & ~king) != 0
+        count += (target != 0) & ~attacked
+    single = _popcount(check) == 1
+
+    # Single check: capture the checker or block the line to a slider. The
+    # block squares are the king's ray in the checker's direction.
+    blocks = np.zeros(len(planes), dtype=np.uint64)
+    pinned = np.zeros(len(planes), dtype=np.uint64)
+    for directions, pieces in ((DIAGONALS, planes[:, BISHOPS]), (ORTHOGONALS, planes[:, ROOKS])):
+        pinners = (pieces | planes[:, QUEENS]) & enemy
+        for amount, mask in directions:
+            ray = _slide(king, empty, amount, mask)
+            blocks |= np.where(ray & check != 0, ray & ~check, _U(0))
+            # A pinned piece can't answer a check: the pin and check lines
+            # only meet at the king
+            first = ray & own
+            pinned |= np.where(_slide(first, empty, amount, mask) & pinners != 0, first, _U(0))
+    targets = np.where(single, check | blocks, _U(0))
+    movers = own & ~king & ~pinned
+
+    for amount, mask in KNIGHT_STEPS:
+        count += _popcount(_shift(planes[:, KNIGHTS] & movers, amount) & mask & targets)
+    diagonal = (planes[:, BISHOPS] | planes[:, QUEENS]) & movers
+    for amount, mask in DIAGONALS:
+        count += _popcount(_slide(diagonal, empty, amount, mask) & targets)
+    orthogonal = (planes[:, ROOKS] | planes[:, QUEENS]) & movers
+    for amount, mask in ORTHOGONALS:
+        count += _popcount(_slide(orthogonal, empty, amount, mask) & targets)
+
+    # Pawn pushes, standard and any-rank double moves, and captures
+    pawns = planes[:, PAWNS] & movers
+    unused = pawns & ~planes[:, DOUBLE_MOVED]
+    white_single = (pawns << _U(8)) & empty
+    white_double = ((white_single & RANK_3) << _U(8)) & empty
+    white_variant = ((((unused & ~RANK_2) << _U(8)) & empty) << _U(8)) & empty
+    black_single = (pawns >> _U(8)) & empty
+    black_double = ((black_single & RANK_6) >> _U(8)) & empty
+    black_variant = ((((unused & ~RANK_7) >> _U(8)) & empty) >> _U(8)) & empty
+    for white_moves, black_moves in ((white_single, black_single), (white_double, black_double),
+                                     (white_variant, black_variant)):
+        count += _moves_to(np.where(turn, white_moves, black_moves) & targets)
+    # Captures land on the checker, never on an empty block square
+    for white_moves, black_moves in (((pawns & NOT_FILE_A) << _U(7), (pawns & NOT_FILE_A) >> _U(9)),
+                                     ((pawns & NOT_FILE_H) << _U(9), (pawns & NOT_FILE_H) >> _U(7))):
+        count += _moves_to(np.where(turn, white_moves, black_moves) & targets & enemy)
+    return count
+
+
+def _pst(bitboards: np.ndarray, color: chess.Color, piece_type: chess.PieceType) -> np.ndarray:
+    table = PST_TABLES[(color, piece_type)]
+    ranks = bitboards.astype("<u8").view(np.uint8).reshape(-1, 8)
+    return table[_RANKS, ranks].sum(axis=1)
+
+
+def evaluate_planes(planes: np.ndarray, turn: np.ndarray,
+                    legal_move_count: Optional[Callable[[int], int]] = None) -> np.ndarray:
+    # Scores from the side to move's point of view. In check the scalar
+    # evaluation counts legal evasions instead of mobility; positions in check
+    # with an en passant square are passed (by index) to legal_move_count.
+    white, black = planes[:, WHITE], planes[:, BLACK]
+
+    material = np.zeros(len(planes), dtype=np.int64)
+    pst = np.zeros(len(planes), dtype=np.int64)
+    for piece_type in chess.PIECE_TYPES:
+        pieces = planes[:, piece_type - 1]
+        material += PIECE_VALUES[piece_type] * (_popcount(pieces & white) - _popcount(pieces & black))
+        if piece_type in (chess.PAWN, chess.KNIGHT):
+            pst += _pst(pieces & white, chess.WHITE, piece_type) - _pst(pieces & black, chess.BLACK, piece_type)
+    score = material + pst * PST_SCALE
+
+    moves = mobility(planes, turn)
+    check = checkers(planes, turn)
+    checked = np.flatnonzero(check)
+    if len(checked):
+        moves[checked] = evasions(planes[checked], turn[checked], check[checked])
+        for index in checked[planes[checked, EP_SQUARE] != 0]:
+            if legal_move_count is None:
+                raise ValueError("position in check with an en passant square needs legal_move_count")
+            moves[index] = legal_move_count(index)
+    score += np.where(turn, moves * 10, -moves * 10)
+
+    score += (30 * (_popcount(white & CENTER_INNER) - _popcount(black & CENTER_INNER)) +
+              15 * (_popcount(white & CENTER_OUTER) - _popcount(black & CENTER_OUTER)))
+
+    # Doubled pawns: pawns beyond one per occupied file
+    doubled = np.zeros(len(planes), dtype=np.int64)
+    for own, sign in ((white, -20), (black, 20)):
+        pawns = planes[:, PAWNS] & own
+        files = pawns | (pawns >> _U(32))
+        files |= files >> _U(16)
+        files |= files >> _U(8)
+        doubled += sign * (_popcount(pawns) - _popcount(files & _U(0xFF)))
+    score += doubled
+
+    # King shield: own pawns on the three squares in front of the king
+    kings, pawns = planes[:, KINGS], planes[:, PAWNS]
+    white_king = kings & white
+    black_king = kings & black
+    white_shield = (((white_king << _U(7)) & NOT_FILE_H) | (white_king << _U(8)) |
+                    ((white_king << _U(9)) & NOT_FILE_A))
+    black_shield = (((black_king >> _U(7)) & NOT_FILE_A) | (black_king >> _U(8)) |
+                    ((black_king >> _U(9)) & NOT_FILE_H))
+    score += 30 * _popcount(white_shield & pawns & white) - 30 * _popcount(black_shield & pawns & black)
+
+    return np.where(turn, score, -score)
+
+
+def evaluate_batch(positions: Sequence[Union[chess.Board, str]]) -> np.ndarray:
+    # Boards or FEN strings (not mixed) to a float64 array of scores
+    if not len(positions):
+        return np.zeros(0)
+    if isinstance(positions[0], str):
+        from game import VariantBoard
+        planes, turn = encode_fens(positions)
+        return evaluate_planes(planes, turn, lambda i: VariantBoard(positions[i]).legal_moves.count())
+    planes, turn = encode_boards(positions)
+    return evaluate_planes(planes, turn, lambda i: positions[i].legal_moves.count())
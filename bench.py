@@ -0,0 +1,320 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+import chess
+
+from game import VariantBoard
+from ai import ChessAI
+from searchstats import JsonLinesWriter, StatsSink
+
+# Fixed benchmark positions: opening, middlegame, endgame and variant positions
+# where advanced pawns still have their double move (seventh FEN field)
+POSITIONS = [
+    ("start", "opening", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"),
+    ("italian", "opening", "r1bqk1nr/pppp1ppp/2n5/2b1p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4"),
+    ("queens-gambit", "opening", "rnbqkb1r/ppp2ppp/4pn2/3p4/2PP4/2N5/PP2PPPP/R1BQKBNR w KQkq - 2 4"),
+    ("middlegame", "middlegame", "r2q1rk1/pp2bppp/2n1pn2/3p4/3P4/2NBPN2/PP3PPP/R2Q1RK1 w - - 0 10"),
+    ("kiwipete", "middlegame", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"),
+    ("tactical", "middlegame", "r1b1kb1r/pppp1ppp/5q2/4n3/3KP3/2N3PN/PPP4P/R1BQ1B1R b kq - 0 1"),
+    ("rook-endgame", "endgame", "8/5pk1/6p1/8/3R4/6P1/5PK1/r7 w - - 0 40"),
+    ("pawn-endgame", "endgame", "8/8/3k4/3p4/3P4/3K4/8/8 w - - 0 50"),
+    ("variant-center", "variant",
+     "r1bqkb1r/pp3ppp/2n1pn2/2pp4/3P4/2P1PN2/PP3PPP/RNBQKB1R w KQkq - 0 5 -"),
+    ("variant-used", "variant",
+     "r1bqkbnr/pp1p1ppp/2n5/2p1p3/4P3/3P1N2/PPP2PPP/RNBQKB1R w KQkq - 0 4 e4c5"),
+    ("variant-race", "variant", "8/5k2/8/3p4/8/2P1P3/5K2/8 w - - 0 1 -"),
+]
+
+# Throughput figures compared against the baseline; higher is better
+THROUGHPUT_METRICS = ("evals_per_sec", "nodes_per_sec")
+
+
+def load_positions() -> List[VariantBoard]:
+    return [VariantBoard(fen) for _, _, fen in POSITIONS]
+
+
+def bench_evals(ai: ChessAI, boards: List[VariantBoard], iterations: int) -> float:
+    # Static evaluation throughput in evals/sec
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for board in boards:
+            ai.evaluate_position(board)
+    return iterations * len(boards) / (time.perf_counter() - start)
+
+
+def bench_search(name: str, board: VariantBoard, depth: int, hash_mb: float,
+                 stats_sink: Optional[StatsSink] = None) -> Dict:
+    # Fixed-depth search from a fresh engine so runs are comparable
+    ai = ChessAI(depth=depth, hash_mb=hash_mb)
+    if stats_sink is not None:
+        ai.enable_stats(stats_sink)
+    start = time.perf_counter()
+    move = ai.get_best_move(board)
+    elapsed = time.perf_counter() - start
+
+    nodes = ai.nodes + ai.qnodes
+    # Effective branching factor: geometric mean growth of the per-iteration node counts
+    per_iteration = []
+    previous = 0
+    for _, total, _ in ai.iterations:
+        per_iteration.append(total - previous)
+        previous = total
+    branching = 0.0
+    if len(per_iteration) > 1 and per_iteration[0]:
+        branching = (per_iteration[-1] / per_iteration[0]) ** (1 / (len(per_iteration) - 1))
+
+    tt = ai.transposition_table.stats()
+    first_move_cutoff_rate = ai.first_move_cutoffs / ai.beta_cutoffs if ai.beta_cutoffs else 0.0
+    # Everything reported for the cold run is read before the warm run
+    # overwrites the engine's search state
+    cold = {
+        "name": name,
+        "move": move.uci() if move else None,
+        "score": ai.last_score,
+        "depth": ai.completed_depth,
+        "nodes": nodes,
+        "qnodes": ai.qnodes,
+        "seconds": elapsed,
+        "nodes_per_sec": nodes / elapsed if elapsed else 0.0,
+        "time_to_depth": {str(d): seconds for d, _, seconds in ai.iterations},
+        "tt_hit_rate": tt["hit_rate"],
+        "branching_factor": branching,
+        "first_move_cutoff_rate": first_move_cutoff_rate,
+    }
+
+    # Warm start: the same position in a later game, with the table kept
+    # (as GameManager does across games and restarts). Its search is not
+    # written to the stats sink, which gets one record per position
+    ai.disable_stats()
+    ai.new_game()
+    start = time.perf_counter()
+    warm_move = ai.get_best_move(board)
+    warm_seconds = time.perf_counter() - start
+    return {
+        **cold,
+        "warm_move": warm_move.uci() if warm_move else None,
+        "warm_score": ai.last_score,
+        "warm_depth": ai.completed_depth,
+        "warm_nodes": ai.nodes + ai.qnodes,
+        "warm_seconds": warm_seconds,
+        "warm_time_to_depth": {str(d): seconds for d, _, seconds in ai.iterations},
+    }
+
+
+def bench_scaling(boards: List[VariantBoard], depth: int, hash_mb: float,
+                  worker_counts: List[int]) -> List[Dict]:
+    # Time to reach a fixed depth on every position with 1..N search processes;
+    # nodes include those searched by the Lazy SMP helpers
+    rows = []
+    for workers in worker_counts:
+        ai = ChessAI(depth=depth, hash_mb=hash_mb, workers=workers)
+        nodes = 0
+        seconds = 0.0
+        try:
+            for board in boards:
+                ai.transposition_table.clear()
+                start = time.perf_counter()
+                ai.get_best_move(board)
+                seconds += time.perf_counter() - start
+                nodes += ai.nodes + ai.qnodes + ai.helper_nodes
+        finally:
+            ai.close()
+        rows.append({
+            "workers": workers,
+            "active_workers": ai.workers,
+            "seconds": seconds,
+            "nodes": nodes,
+            "nodes_per_sec": nodes / seconds if seconds else 0.0,
+            "speedup": rows[0]["seconds"] / seconds if rows and seconds else 1.0,
+        })
+    return rows
+
+
+def print_scaling(rows: List[Dict]) -> None:
+    print(f"{'workers':>7} {'time':>8} {'nodes':>10} {'nodes/s':>9} {'speedup':>7}")
+    for row in rows:
+        note = "" if row["active_workers"] == row["workers"] else " (single-process fallback)"
+        print(f"{row['workers']:>7} {row['seconds']:>7.2f}s {row['nodes']:>10,} "
+              f"{row['nodes_per_sec']:>9,.0f} {row['speedup']:>6.2f}x{note}")
+
+
+def batch_positions(count: int, seed: int = 0) -> List[VariantBoard]:
+    # Random playouts of up to 30 plies from the benchmark positions, so the
+    # set mixes phases, checks, en passant squares and used double moves
+    rng = random.Random(seed)
+    starts = load_positions()
+    boards = []
+    while len(boards) < count:
+        board = rng.choice(starts).copy(stack=False)
+        for _ in range(rng.randint(0, 30)):
+            moves = list(board.legal_moves)
+            if not moves:
+                break
+            board.push(rng.choice(moves))
+        if not board.is_game_over():
+            boards.append(board.copy(stack=False))
+    return boards
+
+
+def bench_batch(count: int) -> Dict:
+    # evaluate_batch against evaluate_position on the same existing boards.
+    # FEN input is not compared: most of its gain is skipping VariantBoard
+    # construction, not faster evaluation.
+    from batcheval import evaluate_batch
+
+    ai = ChessAI()
+    boards = batch_positions(count)
+    start = time.perf_counter()
+    expected = [ai.evaluate_position(board) for board in boards]
+    scalar_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    scores = evaluate_batch(boards)
+    batch_seconds = time.perf_counter() - start
+    if scores.tolist() != expected:
+        raise AssertionError("evaluate_batch differs from evaluate_position")
+    return {
+        "positions": count,
+        "scalar_per_sec": count / scalar_seconds,
+        "batch_per_sec": count / batch_seconds,
+        "speedup": scalar_seconds / batch_seconds,
+    }
+
+
+def print_batch(results: Dict) -> None:
+    print(f"batch evaluation of {results['positions']:,} boards: scalar {results['scalar_per_sec']:,.0f}/s, "
+          f"batch {results['batch_per_sec']:,.0f}/s ({results['speedup']:.1f}x)")
+
+
+def run(depth: int, eval_iterations: int, hash_mb: float, stats_sink: Optional[StatsSink] = None,
+        repeat: int = 1) -> Dict:
+    # Timings are the best of repeat runs, which filters out most of the
+    # noise of a busy machine; node counts are the same in every run
+    boards = load_positions()
+    evals_per_sec = max(bench_evals(ChessAI(), boards, eval_iterations) for _ in range(repeat))
+
+    positions = []
+    for (name, category, _), board in zip(POSITIONS, boards):
+        runs = [bench_search(name, board, depth, hash_mb, stats_sink if i == 0 else None)
+                for i in range(repeat)]
+        result = min(runs, key=lambda r: r["seconds"])
+        result["category"] = category
+        positions.append(result)
+
+    nodes = sum(p["nodes"] for p in positions)
+    seconds = sum(p["seconds"] for p in positions)
+    warm_seconds = sum(p["warm_seconds"] for p in positions)
+    return {
+        "python": platform.python_version(),
+        "chess": chess.__version__,
+        "depth": depth,
+        "repeat": repeat,
+        "evals_per_sec": evals_per_sec,
+        "nodes": nodes,
+        "seconds": seconds,
+        "nodes_per_sec": nodes / seconds if seconds else 0.0,
+        "warm_seconds": warm_seconds,
+        "warm_speedup": seconds / warm_seconds if warm_seconds else 0.0,
+        "tt_hit_rate": sum(p["tt_hit_rate"] for p in positions) / len(positions),
+        "branching_factor": sum(p["branching_factor"] for p in positions) / len(positions),
+        "positions": positions,
+    }
+
+
+def print_report(results: Dict) -> None:
+    print(f"{'position':<16} {'move':<6} {'nodes':>9} {'nodes/s':>9} {'time':>7} "
+          f"{'warm':>7} {'tt hit':>7} {'ebf':>5} {'1st cut':>7}")
+    for p in results["positions"]:
+        print(f"{p['name']:<16} {p['move'] or '-':<6} {p['nodes']:>9,} {p['nodes_per_sec']:>9,.0f} "
+              f"{p['seconds']:>6.2f}s {p['warm_seconds']:>6.2f}s {p['tt_hit_rate']:>7.1%} "
+              f"{p['branching_factor']:>5.2f} {p['first_move_cutoff_rate']:>7.1%}")
+    print(f"evals/sec: {results['evals_per_sec']:,.0f}")
+    print(f"search: {results['nodes']:,} nodes in {results['seconds']:.2f}s "
+          f"({results['nodes_per_sec']:,.0f} nodes/sec) at depth {results['depth']}, "
+          f"tt hit rate {results['tt_hit_rate']:.1%}, branching factor {results['branching_factor']:.2f}")
+    print(f"time to depth cold {results['seconds']:.2f}s, warm {results['warm_seconds']:.2f}s "
+          f"({results['warm_speedup']:.1f}x)")
+
+
+def compare_baseline(results: Dict, baseline: Dict, threshold: float) -> List[str]:
+    # Throughput below baseline * (1 - threshold) counts as a regression, and
+    # so does any change of the deterministic node count
+    regressions = []
+    for metric in THROUGHPUT_METRICS:
+        old, new = baseline.get(metric), results[metric]
+        if not old:
+            continue
+        change = new / old - 1
+        print(f"{metric}: {new:,.0f} vs baseline {old:,.0f} ({change:+.1%})")
+        if change < -threshold:
+            regressions.append(f"{metric} regressed {-change:.1%} (threshold {threshold:.0%})")
+    if baseline.get("depth") == results["depth"] and baseline.get("nodes") != results["nodes"]:
+        # Node counts are deterministic, so a change means the search itself
+        # changed: check its strength and write a new baseline if intended
+        regressions.append(f"node count changed from {baseline.get('nodes'):,} to {results['nodes']:,}")
+    return regressions
+
+
+def write_json(results: Dict, path: str) -> None:
+    if path == "-":
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="ChessAI benchmarks")
+    parser.add_argument("--depth", type=int, default=4,
+                        help="fixed search depth for every position")
+    parser.add_argument("--eval-iterations", type=int, default=2000,
+                        help="passes over the positions for the evaluation microbenchmark")
+    parser.add_argument("--hash", type=float, default=16, help="transposition table size in MB")
+    parser.add_argument("--scaling", metavar="N,N,...",
+                        help="also report parallel search scaling for these worker counts, e.g. 1,2,4,8")
+    parser.add_argument("--batch", type=int, metavar="N",
+                        help="also compare evaluate_batch with evaluate_position on N boards (needs numpy)")
+    parser.add_argument("--json", metavar="PATH", help="write the results as JSON ('-' for stdout)")
+    parser.add_argument("--baseline", metavar="PATH", help="compare throughput against this results file")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per measurement; the fastest one is reported")
+    parser.add_argument("--threshold", type=float, default=0.15,
+                        help="allowed throughput drop against the baseline before failing")
+    parser.add_argument("--stats", metavar="PATH",
+                        help="append per-search stats as JSON lines (timing every eval term slows the search)")
+    args = parser.parse_args(argv)
+
+    writer = JsonLinesWriter(args.stats) if args.stats else None
+    try:
+        results = run(args.depth, args.eval_iterations, args.hash, writer, max(args.repeat, 1))
+    finally:
+        if writer:
+            writer.close()
+    print_report(results)
+    if args.scaling:
+        worker_counts = [int(n) for n in args.scaling.split(",")]
+        results["scaling"] = bench_scaling(load_positions(), args.depth, args.hash, worker_counts)
+        print_scaling(results["scaling"])
+    if args.batch:
+        results["batch"] = bench_batch(args.batch)
+        print_batch(results["batch"])
+    if args.json:
+        write_json(results, args.json)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_baseline(results, baseline, args.threshold)
+        for message in regressions:
+            print(f"REGRESSION: {message}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
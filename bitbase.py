@@ -0,0 +1,361 @@
+import argparse
+import os
+import random
+import time
+from collections import deque
+from typing import Dict, Optional
+
+import chess
+
+from game import VariantBoard
+
+# Win/draw bitbases for KPK, KRK and KQK. Each table is a bit array with one
+# bit per position, set when the side with the extra piece wins; the weak
+# side can never win these endings, so one bit is enough. Positions are
+# normalized so the strong side is White:
+#   KXK: index = ((stm * 64 + wk) * 64 + bk) * 64 + piece
+#   KPK: index = (((flag * 2 + stm) * 64 + wk) * 64 + bk) * 64 + pawn
+# where stm is 0 with the strong side to move and flag is 1 while the pawn
+# still has its variant double move.
+DEFAULT_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bitbases")
+TABLES = {"kpk": chess.PAWN, "krk": chess.ROOK, "kqk": chess.QUEEN}
+KXK_SIZE = 2 * 64 * 64 * 64
+KPK_SIZE = 2 * KXK_SIZE
+
+WHITE_TO_MOVE = 0
+BLACK_TO_MOVE = 1
+
+BB_SQUARES = chess.BB_SQUARES
+KING_ATTACKS = chess.BB_KING_ATTACKS
+PAWN_ATTACKS = chess.BB_PAWN_ATTACKS[chess.WHITE]
+
+
+def kxk_index(stm: int, wk: int, bk: int, piece: int) -> int:
+    return ((stm * 64 + wk) * 64 + bk) * 64 + piece
+
+
+def kpk_index(flag: int, stm: int, wk: int, bk: int, pawn: int) -> int:
+    return (((flag * 2 + stm) * 64 + wk) * 64 + bk) * 64 + pawn
+
+
+def piece_attacks(piece_type: chess.PieceType, square: int, occupied: int) -> int:
+    attacks = 0
+    if piece_type in (chess.ROOK, chess.QUEEN):
+        attacks |= (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] |
+                    chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied])
+    if piece_type in (chess.BISHOP, chess.QUEEN):
+        attacks |= chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied]
+    return attacks
+
+
+def _pack_bits(wins: bytearray) -> bytes:
+    bits = bytearray((len(wins) + 7) // 8)
+    for index in range(len(wins)):
+        if wins[index]:
+            bits[index >> 3] |= 1 << (index & 7)
+    return bytes(bits)
+
+
+def generate_kxk(piece_type: chess.PieceType) -> bytes:
+    # Retrograde analysis: start from the mates and walk backwards through
+    # un-moves. A black-to-move position is lost once every black move leads
+    # to a lost position, so each one keeps a count of unrefuted moves.
+    wins = bytearray(KXK_SIZE)
+    remaining = bytearray(KXK_SIZE // 2)
+    queue = deque()
+
+    for wk in range(64):
+        for bk in range(64):
+            if bk == wk or KING_ATTACKS[wk] & BB_SQUARES[bk]:
+                continue
+            for piece in range(64):
+                if piece == wk or piece == bk:
+                    continue
+                # Black king moves; the piece's attacks x-ray through the black king
+                attacked = KING_ATTACKS[wk] | piece_attacks(piece_type, piece, BB_SQUARES[wk])
+                moves = KING_ATTACKS[bk] & ~attacked
+                if moves & BB_SQUARES[piece]:
+                    continue  # the undefended piece can be taken: draw
+                count = chess.popcount(moves)
+                if count:
+                    remaining[(wk * 64 + bk) * 64 + piece] = count
+                elif attacked & BB_SQUARES[bk]:
+                    index = kxk_index(BLACK_TO_MOVE, wk, bk, piece)
+                    wins[index] = 1
+                    queue.append(index)
+
+    while queue:
+        index = queue.popleft()
+        stm, rest = divmod(index, 64 * 64 * 64)
+        wk, rest = divmod(rest, 64 * 64)
+        bk, piece = divmod(rest, 64)
+        wk_bb, bk_bb, piece_bb = BB_SQUARES[wk], BB_SQUARES[bk], BB_SQUARES[piece]
+
+        if stm == BLACK_TO_MOVE:
+            # White just moved: un-move the king or the piece. The position
+            # before White's move must not have Black in check.
+            for square in chess.scan_forward(KING_ATTACKS[wk] & ~(bk_bb | piece_bb | KING_ATTACKS[bk])):
+                if piece_attacks(piece_type, piece, BB_SQUARES[square] | bk_bb) & bk_bb:
+                    continue
+                parent = kxk_index(WHITE_TO_MOVE, square, bk, piece)
+                if not wins[parent]:
+                    wins[parent] = 1
+                    queue.append(parent)
+            for square in chess.scan_forward(piece_attacks(piece_type, piece, wk_bb | bk_bb) & ~(wk_bb | bk_bb)):
+                if piece_attacks(piece_type, square, wk_bb | bk_bb) & bk_bb:
+                    continue
+                parent = kxk_index(WHITE_TO_MOVE, wk, bk, square)
+                if not wins[parent]:
+                    wins[parent] = 1
+                    queue.append(parent)
+        else:
+            # Black just moved its king here from a neighbouring square
+            for square in chess.scan_forward(KING_ATTACKS[bk] & ~(wk_bb | piece_bb | KING_ATTACKS[wk])):
+                slot = (wk * 64 + square) * 64 + piece
+                if remaining[slot]:
+                    remaining[slot] -= 1
+                    if not remaining[slot]:
+                        parent = kxk_index(BLACK_TO_MOVE, wk, square, piece)
+                        wins[parent] = 1
+                        queue.append(parent)
+
+    return _pack_bits(wins)
+
+
+def generate_kpk(krk: bytes, kqk: bytes) -> bytes:
+    # Pawn moves are irreversible, so the table is solved one layer (pawn
+    # square and double move flag) at a time, from the 7th rank down. Pawn
+    # moves lead to solved layers, or to KQK/KRK after a promotion; king
+    # moves stay inside the layer and are solved retrogradely as in KXK.
+    wins = bytearray(KPK_SIZE)
+
+    def promotes_to_win(wk: int, bk: int, square: int) -> bool:
+        index = kxk_index(BLACK_TO_MOVE, wk, bk, square)
+        return bool((kqk[index >> 3] | krk[index >> 3]) >> (index & 7) & 1)
+
+    def pawn_child_wins(wk: int, bk: int, square: int, flag: int) -> bool:
+        if square >= 56:
+            return promotes_to_win(wk, bk, square)
+        return bool(wins[kpk_index(flag, BLACK_TO_MOVE, wk, bk, square)])
+
+    for rank in range(6, 0, -1):
+        for file in range(8):
+            pawn = chess.square(file, rank)
+            pawn_bb = BB_SQUARES[pawn]
+            for flag in (0, 1):
+                # A pawn on its starting rank always has the (standard) double
+                # move, and keeps it after a single step
+                single_flag = 1 if rank == 1 else flag
+                can_double = rank == 1 or (flag and rank <= 5)
+                remaining = bytearray(64 * 64)
+                queue = deque()
+
+                for wk in range(64):
+                    if wk == pawn:
+                        continue
+                    for bk in range(64):
+                        if bk == wk or bk == pawn or KING_ATTACKS[wk] & BB_SQUARES[bk]:
+                            continue
+                        occupied = BB_SQUARES[wk] | BB_SQUARES[bk]
+
+                        # Black to move
+                        attacked = KING_ATTACKS[wk] | PAWN_ATTACKS[pawn]
+                        moves = KING_ATTACKS[bk] & ~attacked
+                        if not moves & pawn_bb:
+                            count = chess.popcount(moves)
+                            if count:
+                                remaining[wk * 64 + bk] = count
+                            elif PAWN_ATTACKS[pawn] & BB_SQUARES[bk]:
+                                index = kpk_index(flag, BLACK_TO_MOVE, wk, bk, pawn)
+                                wins[index] = 1
+                                queue.append(index)
+
+                        # White to move: seed with winning pawn moves
+                        if PAWN_ATTACKS[pawn] & BB_SQUARES[bk]:
+                            continue
+                        single = pawn + 8
+                        if occupied & BB_SQUARES[single]:
+                            continue
+                        if (pawn_child_wins(wk, bk, single, single_flag) or
+                                (can_double and not occupied & BB_SQUARES[pawn + 16] and
+                                 pawn_child_wins(wk, bk, pawn + 16, 0))):
+                            index = kpk_index(flag, WHITE_TO_MOVE, wk, bk, pawn)
+                            wins[index] = 1
+                            queue.append(index)
+
+                while queue:
+                    index = queue.popleft()
+                    stm = (index >> 18) & 1
+                    wk = (index >> 12) & 63
+                    bk = (index >> 6) & 63
+                    wk_bb, bk_bb = BB_SQUARES[wk], BB_SQUARES[bk]
+                    if stm == BLACK_TO_MOVE:
+                        if PAWN_ATTACKS[pawn] & bk_bb:
+                            continue  # only a pawn move can give this check
+                        for square in chess.scan_forward(KING_ATTACKS[wk] & ~(bk_bb | pawn_bb | KING_ATTACKS[bk])):
+                            parent = kpk_index(flag, WHITE_TO_MOVE, square, bk, pawn)
+                            if not wins[parent]:
+                                wins[parent] = 1
+                                queue.append(parent)
+                    else:
+                        for square in chess.scan_forward(KING_ATTACKS[bk] & ~(wk_bb | pawn_bb | KING_ATTACKS[wk])):
+                            slot = wk * 64 + square
+                            if remaining[slot]:
+                                remaining[slot] -= 1
+                                if not remaining[slot]:
+                                    parent = kpk_index(flag, BLACK_TO_MOVE, wk, square, pawn)
+                                    wins[parent] = 1
+                                    queue.append(parent)
+
+    return _pack_bits(wins)
+
+
+def generate(directory: str = DEFAULT_DIRECTORY) -> None:
+    os.makedirs(directory, exist_ok=True)
+    tables = {}
+    for name in ("krk", "kqk"):
+        start = time.perf_counter()
+        tables[name] = generate_kxk(TABLES[name])
+        print(f"{name}: {time.perf_counter() - start:.1f}s")
+    start = time.perf_counter()
+    tables["kpk"] = generate_kpk(tables["krk"], tables["kqk"])
+    print(f"kpk: {time.perf_counter() - start:.1f}s")
+    for name, bits in tables.items():
+        with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+            f.write(bits)
+
+
+class Bitbases:
+    # Loaded tables are plain bytes objects; a probe is a few bit operations
+    def __init__(self, directory: str = DEFAULT_DIRECTORY):
+        self.tables: Dict[chess.PieceType, bytes] = {}
+        for name, piece_type in TABLES.items():
+            path = os.path.join(directory, f"{name}.bin")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    self.tables[piece_type] = f.read()
+
+    def __bool__(self) -> bool:
+        return bool(self.tables)
+
+    def index(self, board: VariantBoard) -> Optional[int]:
+        # Table index for a three-piece position, or None if not covered
+        if chess.popcount(board.occupied) != 3:
+            return None
+        extra = board.occupied & ~board.kings
+        square = chess.lsb(extra)
+        piece_type = board.piece_type_at(square)
+        bits = self.tables.get(piece_type)
+        if bits is None:
+            return None
+        strong = bool(board.occupied_co[chess.WHITE] & extra)
+        wk = board.king(strong)
+        bk = board.king(not strong)
+        stm = WHITE_TO_MOVE if board.turn == strong else BLACK_TO_MOVE
+        if not strong:
+            # Mirror vertically so the strong side plays up the board
+            wk, bk, square = wk ^ 56, bk ^ 56, square ^ 56
+        if piece_type == chess.PAWN:
+            flag = 0 if board.double_moved & extra and square >= 16 else 1
+            return kpk_index(flag, stm, wk, bk, square)
+        return kxk_index(stm, wk, bk, square)
+
+    def probe(self, board: VariantBoard) -> Optional[int]:
+        # 1 if the side to move wins, -1 if it loses, 0 for a draw, None if
+        # the position is not in a table
+        index = self.index(board)
+        if index is None:
+            return None
+        bits = self.tables[board.piece_type_at(chess.lsb(board.occupied & ~board.kings))]
+        if not bits[index >> 3] >> (index & 7) & 1:
+            return 0
+        strong = bool(board.occupied_co[chess.WHITE] & ~board.kings)
+        return 1 if board.turn == strong else -1
+
+
+def _random_position(piece_type: chess.PieceType, rng: random.Random) -> VariantBoard:
+    while True:
+        squares = rng.sample(range(64), 3)
+        if piece_type == chess.PAWN and not 8 <= squares[2] < 56:
+            continue
+        board = VariantBoard(None)
+        strong = rng.choice(chess.COLORS)
+        board.set_piece_at(squares[0], chess.Piece(chess.KING, strong))
+        board.set_piece_at(squares[1], chess.Piece(chess.KING, not strong))
+        board.set_piece_at(squares[2], chess.Piece(piece_type, strong))
+        board.turn = rng.choice(chess.COLORS)
+        # Pawns on their starting rank can't have used the double move
+        relative = squares[2] if strong else squares[2] ^ 56
+        if piece_type == chess.PAWN and relative >= 16 and rng.random() < 0.5:
+            board.double_moved_pawns = {squares[2]}
+        if board.is_valid():
+            return board
+
+
+def selftest(bitbases: Bitbases, samples: int, seed: int = 0) -> bool:
+    # Every sampled position must agree with a one-ply search over the tables
+    # (terminal positions, captures and promotions resolved directly)
+    rng = random.Random(seed)
+    failures = 0
+    for piece_type in bitbases.tables:
+        for _ in range(samples):
+            board = _random_position(piece_type, rng)
+            expected = bitbases.probe(board)
+            if board.is_checkmate():
+                actual = -1
+            elif board.is_game_over():
+                actual = 0
+            else:
+                actual = -1
+                for move in board.legal_moves:
+                    board.push(move)
+                    if board.is_checkmate():
+                        child = -1
+                    elif board.is_insufficient_material() or board.is_stalemate():
+                        child = 0
+                    else:
+                        child = bitbases.probe(board)
+                        # Promotions to a bishop or knight leave a drawn ending
+                        child = 0 if child is None else child
+                    board.pop()
+                    actual = max(actual, -child)
+            if actual != expected:
+                failures += 1
+                print(f"mismatch {board.variant_fen()}: table {expected}, search {actual}")
+    print(f"selftest: {samples * len(bitbases.tables)} positions, {failures} mismatches")
+    return not failures
+
+
+def bench(bitbases: Bitbases, probes: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    for piece_type in bitbases.tables:
+        boards = [_random_position(piece_type, rng) for _ in range(256)]
+        start = time.perf_counter()
+        for i in range(probes):
+            bitbases.index(boards[i & 255])
+        index_rate = probes / (time.perf_counter() - start)
+        start = time.perf_counter()
+        for i in range(probes):
+            bitbases.probe(boards[i & 255])
+        probe_rate = probes / (time.perf_counter() - start)
+        print(f"{chess.piece_name(piece_type):<6} index {index_rate:>12,.0f}/s  probe {probe_rate:>12,.0f}/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="KPK/KRK/KQK bitbases")
+    parser.add_argument("command", choices=("generate", "selftest", "bench"))
+    parser.add_argument("--dir", default=DEFAULT_DIRECTORY, help="bitbase directory")
+    parser.add_argument("--samples", type=int, default=2000, help="positions per table for selftest")
+    parser.add_argument("--probes", type=int, default=200000, help="probes per table for bench")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generate(args.dir)
+    elif args.command == "selftest":
+        raise SystemExit(0 if selftest(Bitbases(args.dir), args.samples) else 1)
+    else:
+        bench(Bitbases(args.dir), args.probes)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import mmap
+import random
+import struct
+import chess
+import chess.pgn
+from typing import Dict, List, Optional, Tuple
+
+from game import MainlineVisitor, VariantBoard
+from transposition import pack_move, unpack_move
+
+# Polyglot-like entries: Zobrist key, packed move, weight, unused learn field.
+# Keys are VariantBoard.zobrist_key, so used double moves are part of the position.
+ENTRY = struct.Struct(">QHHI")
+ENTRY_SIZE = ENTRY.size
+MAX_WEIGHT = 0xFFFF
+
+
+class OpeningBook:
+    # Read-only view of a book file. The file is memory-mapped and searched in
+    # place, so opening is free and every process shares the same pages.
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = self._file.seek(0, 2)
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.num_entries = size // ENTRY_SIZE
+
+    def __len__(self) -> int:
+        return self.num_entries
+
+    def _key_at(self, index: int) -> int:
+        return struct.unpack_from(">Q", self._map, index * ENTRY_SIZE)[0]
+
+    def _lower_bound(self, key: int) -> int:
+        lo, hi = 0, self.num_entries
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def entries(self, board: VariantBoard) -> List[Tuple[chess.Move, int]]:
+        # Legal book moves for the position with their weights, best first
+        key = board.zobrist_key
+        found = []
+        index = self._lower_bound(key)
+        while index < self.num_entries:
+            entry_key, packed, weight, _ = ENTRY.unpack_from(self._map, index * ENTRY_SIZE)
+            if entry_key != key:
+                break
+            move = unpack_move(packed)
+            # Guards against key collisions with positions not in the book
+            if weight and board.is_legal(move):
+                found.append((move, weight))
+            index += 1
+        return found
+
+    def choose(self, board: VariantBoard, rng: Optional[random.Random] = None) -> Optional[chess.Move]:
+        # Weighted random pick among the book moves, None when out of book
+        found = self.entries(board)
+        if not found:
+            return None
+        rng = rng or random
+        return rng.choices([move for move, _ in found], weights=[weight for _, weight in found])[0]
+
+    def close(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class BookBuilder:
+    # Collects (position, move) weights and writes them as a sorted book file
+    def __init__(self, max_ply: int = 16):
+        self.max_ply = max_ply
+        self.weights: Dict[int, Dict[int, int]] = {}
+
+    def add(self, board: VariantBoard, move: chess.Move, weight: int = 1) -> None:
+        moves = self.weights.setdefault(board.zobrist_key, {})
+        packed = pack_move(move)
+        moves[packed] = moves.get(packed, 0) + weight
+
+    def add_game(self, moves: List[chess.Move], result: str = "*",
+                 board: Optional[VariantBoard] = None) -> None:
+        # Polyglot weighting: 2 for the winner's moves, 1 for draws and
+        # unfinished games, 0 for the loser's
+        board = board or VariantBoard()
+        for move in moves[:self.max_ply]:
+            if result == "1-0":
+                weight = 2 if board.turn == chess.WHITE else 0
+            elif result == "0-1":
+                weight = 2 if board.turn == chess.BLACK else 0
+            else:
+                weight = 1
+            if weight:
+                self.add(board, move, weight)
+            board.push(move)
+
+    def add_pgn(self, path: str) -> int:
+        games = 0
+        with open(path) as f:
+            while True:
+                # The SAN is replayed on a VariantBoard, so variant double
+                # moves parse and the keys match what the engine probes
+                game = chess.pgn.read_game(f, Visitor=MainlineVisitor)
+                if game is None:
+                    break
+                try:
+                    board = VariantBoard(game.headers.get("FEN", chess.STARTING_FEN))
+                except ValueError:
+                    continue
+                start = board.copy()
+                moves = []
+                for san in game.san:
+                    try:
+                        move = board.parse_san(san)
+                    except ValueError:
+                        break
+                    moves.append(move)
+                    board.push(move)
+                self.add_game(moves, game.headers.get("Result", "*"), start)
+                games += 1
+        return games
+
+    def add_selfplay(self, games: int, depth: int = 3, random_plies: int = 2, seed: int = 0) -> None:
+        # Engine games. The engine's choice is recorded in every position, but
+        # the first few plies actually played are random for variety.
+        from ai import ChessAI
+        rng = random.Random(seed)
+        ai = ChessAI(depth=depth)
+        for _ in range(games):
+            board = VariantBoard()
+            while len(board.move_stack) < self.max_ply and not board.is_game_over():
+                move = ai.get_best_move(board)
+                self.add(board, move)
+                if len(board.move_stack) < random_plies:
+                    move = rng.choice(list(board.legal_moves))
+                board.push(move)
+
+    def write(self, path: str) -> int:
+        entries = []
+        for key, moves in self.weights.items():
+            # Scale each position's weights into 16 bits, keeping the ratios
+            scale = max(1, max(moves.values()) / MAX_WEIGHT)
+            for packed, weight in moves.items():
+                entries.append((key, -weight, packed, max(1, int(weight / scale))))
+        entries.sort()
+        with open(path, "wb") as f:
+            for key, _, packed, weight in entries:
+                f.write(ENTRY.pack(key, packed, weight, 0))
+        return len(entries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build or probe an opening book")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="build a book from PGN files and/or self-play")
+    build.add_argument("output")
+    build.add_argument("--pgn", action="append", default=[], help="PGN file to include (repeatable)")
+    build.add_argument("--selfplay", type=int, default=0, help="number of self-play games")
+    build.add_argument("--depth", type=int, default=3, help="self-play search depth")
+    build.add_argument("--plies", type=int, default=16, help="book depth in plies")
+    build.add_argument("--seed", type=int, default=0)
+
+    probe = commands.add_parser("probe", help="list the book moves for a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", default=chess.STARTING_FEN)
+
+    args = parser.parse_args()
+    if args.command == "build":
+        builder = BookBuilder(args.plies)
+        for path in args.pgn:
+            print(f"{path}: {builder.add_pgn(path)} games")
+        if args.selfplay:
+            builder.add_selfplay(args.selfplay, args.depth, seed=args.seed)
+        count = builder.write(args.output)
+        print(f"wrote {count} entries for {len(builder.weights)} positions to {args.output}")
+    else:
+        book = OpeningBook(args.book)
+        board = VariantBoard(args.fen)
+        entries = book.entries(board)
+        total = sum(weight for _, weight in entries) or 1
+        for move, weight in entries:
+            print(f"{board.san(move):<8} {weight:>6} {weight / total:>6.1%}")
+        if not entries:
+            print("out of book")
+        book.close()
+
+
+if __name__ == "__main__":
+    main()
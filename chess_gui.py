@@ -1,10 +1,81 @@
+import argparse
+import logging
+import time
 import chess
 import customtkinter as ctk
 from tkinter import messagebox
+from typing import Dict, Iterable, Optional, Set, Tuple
 from main import GameManager
 
+logger = logging.getLogger("chess_gui")
+
+# Redraw timings are logged as a running average every this many updates
+REDRAW_LOG_INTERVAL = 20
+
+
+def _touched_squares(move: chess.Move) -> Iterable[int]:
+    # Squares whose contents a move can change, without needing the board
+    # before it: castling moves a rook on the king's rank, en passant removes
+    # a pawn beside the from square
+    yield move.from_square
+    yield move.to_square
+    from_file, to_file = chess.square_file(move.from_square), chess.square_file(move.to_square)
+    rank = chess.square_rank(move.from_square)
+    if rank in (0, 7) and abs(from_file - to_file) > 1:
+        yield from (chess.square(file, rank) for file in range(8))
+    elif from_file != to_file:
+        yield chess.square(to_file, rank)
+
+
+class LabelBoard:
+    # One CTkLabel per square
+    def __init__(self, parent, on_click, square_size: int):
+        self.frame = ctk.CTkFrame(parent)
+        self.labels = {}
+        for row in range(8):
+            for col in range(8):
+                square = ctk.CTkLabel(
+                    self.frame,
+                    text="",
+                    width=square_size - 4,
+                    height=square_size - 4,
+                    text_color="black",
+                    font=("Arial", 36),
+                    corner_radius=0
+                )
+                square.grid(row=row, column=col, padx=1, pady=1)
+                square.bind('<Button-1>', lambda e, pos=(row, col): on_click(pos))
+                self.labels[(row, col)] = square
+
+    def set_square(self, row: int, col: int, text: str, color: str) -> None:
+        self.labels[(row, col)].configure(text=text, fg_color=color)
+
+
+class CanvasBoard:
+    # The whole board on one canvas: a rectangle and a text item per square,
+    # created once and changed with itemconfigure
+    def __init__(self, parent, on_click, square_size: int):
+        self.square_size = square_size
+        self.frame = ctk.CTkCanvas(parent, width=8 * square_size, height=8 * square_size,
+                                   highlightthickness=0)
+        self.rects = {}
+        self.texts = {}
+        for row in range(8):
+            for col in range(8):
+                x, y = col * square_size, row * square_size
+                self.rects[(row, col)] = self.frame.create_rectangle(
+                    x, y, x + square_size, y + square_size, width=0)
+                self.texts[(row, col)] = self.frame.create_text(
+                    x + square_size / 2, y + square_size / 2, text="", fill="black", font=("Arial", 36))
+        self.frame.bind('<Button-1>', lambda e: on_click((e.y // square_size, e.x // square_size)))
+
+    def set_square(self, row: int, col: int, text: str, color: str) -> None:
+        self.frame.itemconfigure(self.rects[(row, col)], fill=color)
+        self.frame.itemconfigure(self.texts[(row, col)], text=text)
+
+
 class ChessGUI:
-    def __init__(self):
+    def __init__(self, renderer: str = "labels"):
         # Configure customtkinter
         ctk.set_appearance_mode("dark")
         ctk.set_default_color_theme("blue")
@@ -20,6 +91,9 @@ class ChessGUI:
             '.': ' '
         }
 
+        # "labels" (64 widgets) or "canvas" (one widget)
+        self.renderer = renderer
+
         # Create main containers
         self.create_layout()
 
@@ -30,12 +104,22 @@ class ChessGUI:
         # GUI state
         self.selected_square = None
         self.square_size = 64
+        # Milliseconds between checks for the AI's move
+        self.poll_interval = 100
 
         # Colors
         self.light_square = "#FFFFFF"
         self.dark_square = "#A9A9A9"
         self.selected_color = "#90EE90"
 
+        # What the board widgets currently show: (symbol, color) per square,
+        # and the game, ply and selection that state was drawn from
+        self.shown: Dict[int, Tuple[str, str]] = {}
+        self.shown_game = None
+        self.shown_ply = 0
+        self.shown_selection: Optional[int] = None
+        self.redraw_times = []
+
         # Create game elements
         self.create_info_panel()
         self.create_board()
@@ -44,6 +128,12 @@ class ChessGUI:
         self.moves_list = []
 
         self.update_board()
+        self.window.protocol("WM_DELETE_WINDOW", self.close)
+
+    def close(self):
+        # Saves the engine's transposition table for the next start
+        self.manager.shutdown()
+        self.window.destroy()
 
     def create_layout(self):
         # Create main frames
@@ -118,28 +208,18 @@ class ChessGUI:
         )
         self.check_label.pack(pady=5)
 
-    def create_board(self):
-        self.board_frame = ctk.CTkFrame(self.center_panel)
-        self.board_frame.pack(padx=20, pady=20)
+        # Live depth/node count while the AI searches in the background
+        self.thinking_label = ctk.CTkLabel(
+            self.status_frame,
+            text="",
+            font=("Arial", 12)
+        )
+        self.thinking_label.pack(pady=5)
 
-        self.squares = {}
-        # Create 8x8 grid of labels
-        for row in range(8):
-            for col in range(8):
-                bg_color = self.light_square if (row + col) % 2 == 0 else self.dark_square
-                square = ctk.CTkLabel(
-                    self.board_frame,
-                    text="",
-                    width=60,
-                    height=60,
-                    fg_color=bg_color,
-                    text_color="black",
-                    font=("Arial", 36),
-                    corner_radius=0
-                )
-                square.grid(row=row, column=col, padx=1, pady=1)
-                square.bind('<Button-1>', lambda e, pos=(row, col): self.handle_click(pos))
-                self.squares[(row, col)] = square
+    def create_board(self):
+        board_class = CanvasBoard if self.renderer == "canvas" else LabelBoard
+        self.board_view = board_class(self.center_panel, self.handle_click, self.square_size)
+        self.board_view.frame.pack(padx=20, pady=20)
 
     def create_game_controls(self):
         controls_frame = ctk.CTkFrame(self.left_panel)
@@ -159,6 +239,13 @@ class ChessGUI:
         )
         resign_btn.pack(pady=5)
 
+        ponder_box = ctk.CTkCheckBox(
+            controls_frame,
+            text="Ponder on your time",
+            command=lambda: setattr(self.manager, "ponder", bool(ponder_box.get()))
+        )
+        ponder_box.pack(pady=5)
+
     def create_move_history(self):
         history_label = ctk.CTkLabel(
             self.right_panel,
@@ -175,23 +262,55 @@ class ChessGUI:
         self.history_text.pack(pady=10, padx=10)
 
     def update_board(self):
-        board = chess.Board(self.manager.get_board_state())
-        for row in range(8):
-            for col in range(8):
-                square = chess.square(col, 7-row)
-                piece = board.piece_at(square)
-                piece_symbol = piece.symbol() if piece else '.'
-
-                bg_color = self.light_square if (row + col) % 2 == 0 else self.dark_square
-                if square == self.selected_square:
-                    bg_color = self.selected_color
-
-                self.squares[(row, col)].configure(
-                    text=self.pieces[piece_symbol],
-                    fg_color=bg_color
-                )
+        # Redraws only the squares that changed since the last update: those
+        # touched by the moves played since then and the old and new
+        # selection. A new game or a shorter move stack redraws everything.
+        start = time.perf_counter()
+        game = self.manager.game
+        board = game.board
+        ply = len(board.move_stack)
+        if game is not self.shown_game or ply < self.shown_ply or not self.shown:
+            candidates: Set[int] = set(chess.SQUARES)
+        else:
+            candidates = set()
+            for move in board.move_stack[self.shown_ply:]:
+                candidates.update(_touched_squares(move))
+            for square in (self.shown_selection, self.selected_square):
+                if square is not None:
+                    candidates.add(square)
+
+        changed = 0
+        for square in candidates:
+            piece = board.piece_at(square)
+            row, col = 7 - chess.square_rank(square), chess.square_file(square)
+            bg_color = self.light_square if (row + col) % 2 == 0 else self.dark_square
+            if square == self.selected_square:
+                bg_color = self.selected_color
+            state = (self.pieces[piece.symbol() if piece else '.'], bg_color)
+            if self.shown.get(square) != state:
+                self.board_view.set_square(row, col, *state)
+                self.shown[square] = state
+                changed += 1
+
+        self.shown_game = game
+        self.shown_ply = ply
+        self.shown_selection = self.selected_square
+        self.log_redraw(time.perf_counter() - start, changed)
+
+    def log_redraw(self, seconds: float, changed: int) -> None:
+        self.redraw_times.append(seconds)
+        logger.debug("redraw: %d squares in %.2f ms", changed, seconds * 1000)
+        if len(self.redraw_times) >= REDRAW_LOG_INTERVAL:
+            average = sum(self.redraw_times) / len(self.redraw_times)
+            logger.info("%s renderer: %.2f ms per update over %d updates", self.renderer,
+                        average * 1000, len(self.redraw_times))
+            self.redraw_times = []
 
     def handle_click(self, pos):
+        # Clicks are ignored while the AI is searching its reply
+        if self.manager.is_thinking():
+            return
+
         row, col = pos
         square = chess.square(col, 7-row)
 
@@ -203,42 +322,20 @@ class ChessGUI:
         else:
             try:
                 move_uci = chess.square_name(self.selected_square) + chess.square_name(square)
-                result = self.manager.make_user_move(move_uci)
+                searching = self.manager.submit_user_move(move_uci)
 
                 # Enhanced move history
                 from_square = chess.square_name(self.selected_square)
                 to_square = chess.square_name(square)
                 piece_symbol = self.manager.game.board.piece_type_at(square)
-                move_text = f"White: {piece_symbol} {from_square}-{to_square}\n"
-                move_text += f"Black: {result['ai_move']}\n"
-                self.history_text.insert("end", move_text)
+                self.history_text.insert("end", f"White: {piece_symbol} {from_square}-{to_square}\n")
                 self.history_text.see("end")
 
-                # Update game status with detailed information
-                board = self.manager.game.board
-                if result['is_game_over']:
-                    if board.is_checkmate():
-                        winner = "Black" if board.turn else "White"
-                        messagebox.showinfo("Checkmate!", f"Game Over - {winner} wins by checkmate!")
-                    elif board.is_stalemate():
-                        messagebox.showinfo("Stalemate!", "Game Over - Draw by stalemate")
-                    elif board.is_insufficient_material():
-                        messagebox.showinfo("Draw!", "Game Over - Draw by insufficient material")
-                    elif board.is_fifty_moves():
-                        messagebox.showinfo("Draw!", "Game Over - Draw by fifty-move rule")
-                    elif board.is_repetition():
-                        messagebox.showinfo("Draw!", "Game Over - Draw by repetition")
-                    self.new_game()
+                if searching:
+                    self.status_label.configure(text="AI is thinking...")
+                    self.window.after(self.poll_interval, self.poll_ai)
                 else:
-                    # Update status for ongoing game
-                    if board.is_check():
-                        self.check_label.configure(text="⚠️ CHECK!")
-                    else:
-                        self.check_label.configure(text="")
-
-                    self.status_label.configure(
-                        text=f"Last move: {result['ai_move']}"
-                    )
+                    self.show_game_over()
 
             except ValueError:
                 messagebox.showerror("Invalid Move", "That move is not allowed!")
@@ -249,14 +346,68 @@ class ChessGUI:
 
         self.update_board()
 
+    def poll_ai(self):
+        # Runs on the Tk loop: picks up the AI's move from the background
+        # search, or refreshes the thinking indicator and checks again later
+        if not self.manager.is_thinking():
+            self.thinking_label.configure(text="")
+            return
+
+        result = self.manager.poll()
+        if result is None:
+            info = self.manager.search_info()
+            self.thinking_label.configure(
+                text=f"🤔 Thinking... depth {info['depth']}, {info['nodes']:,} nodes"
+            )
+            self.window.after(self.poll_interval, self.poll_ai)
+            return
+
+        self.thinking_label.configure(text="")
+        self.history_text.insert("end", f"Black: {result['ai_move']}\n")
+        self.history_text.see("end")
+        self.update_board()
+
+        # Update game status with detailed information
+        if result['is_game_over']:
+            self.show_game_over()
+        else:
+            # Update status for ongoing game
+            if self.manager.game.board.is_check():
+                self.check_label.configure(text="⚠️ CHECK!")
+            else:
+                self.check_label.configure(text="")
+
+            self.status_label.configure(
+                text=f"Last move: {result['ai_move']}"
+            )
+
+    def show_game_over(self):
+        board = self.manager.game.board
+        if board.is_checkmate():
+            winner = "Black" if board.turn else "White"
+            messagebox.showinfo("Checkmate!", f"Game Over - {winner} wins by checkmate!")
+        elif board.is_stalemate():
+            messagebox.showinfo("Stalemate!", "Game Over - Draw by stalemate")
+        elif board.is_insufficient_material():
+            messagebox.showinfo("Draw!", "Game Over - Draw by insufficient material")
+        elif board.is_fifty_moves():
+            messagebox.showinfo("Draw!", "Game Over - Draw by fifty-move rule")
+        elif board.is_repetition():
+            messagebox.showinfo("Draw!", "Game Over - Draw by repetition")
+        self.new_game()
+
     def new_game(self):
+        # Cancels a search that is still running
         self.manager.start_new_game()
         self.selected_square = None
+        self.thinking_label.configure(text="")
+        self.check_label.configure(text="")
         self.history_text.delete("1.0", "end")
         self.status_label.configure(text="White to move")
         self.update_board()
 
     def resign_game(self):
+        self.manager.cancel_search()
         messagebox.showinfo("Game Over", "White resigns. Black wins!")
         self.new_game()
 
@@ -273,7 +424,14 @@ class ChessGUI:
         return names.get(piece_type, "")
 
 def main():
-    app = ChessGUI()
+    parser = argparse.ArgumentParser(description="Chess variant GUI")
+    parser.add_argument("--canvas", action="store_true", help="draw the board on one canvas instead of 64 labels")
+    parser.add_argument("--log-redraws", action="store_true", help="log the time taken by each board update")
+    args = parser.parse_args()
+    if args.log_redraws:
+        logging.basicConfig(level=logging.DEBUG, format="%(name)s: %(message)s")
+
+    app = ChessGUI(renderer="canvas" if args.canvas else "labels")
     app.window.mainloop()
 
 if __name__ == "__main__":
@@ -1,32 +1,344 @@
 import chess
-from typing import Optional, Dict, Set
+import chess.pgn
+import random
+from typing import Optional, Dict, Set, List, Tuple, Iterator
+from pst import PIECE_VALUES, PST_BONUS
+
+# Zobrist keys, generated from a fixed seed so keys are stable across runs
+_zobrist_rng = random.Random(0x2F6E2B1)
+ZOBRIST_PIECES = [[[_zobrist_rng.getrandbits(64) for _ in chess.SQUARES]
+                   for _ in range(7)] for _ in chess.COLORS]
+ZOBRIST_CASTLING_SQUARES = [_zobrist_rng.getrandbits(64) for _ in range(4)]
+ZOBRIST_EP_FILES = [_zobrist_rng.getrandbits(64) for _ in range(8)]
+ZOBRIST_BLACK_TO_MOVE = _zobrist_rng.getrandbits(64)
+ZOBRIST_DOUBLE_MOVED = [_zobrist_rng.getrandbits(64) for _ in chess.SQUARES]
+
+# Castling rights are a mask over A1, H1, A8 and H8, folded into a 4-bit index
+ZOBRIST_CASTLING = [0] * 16
+for _rights in range(16):
+    for _bit in range(4):
+        if _rights & (1 << _bit):
+            ZOBRIST_CASTLING[_rights] ^= ZOBRIST_CASTLING_SQUARES[_bit]
+
+
+def _castling_index(castling_rights: int) -> int:
+    return ((castling_rights & 1) | ((castling_rights >> 6) & 2) |
+            ((castling_rights >> 54) & 4) | ((castling_rights >> 60) & 8))
+
+
+def compute_material_pst(board: chess.Board) -> Tuple[List[int], List[int]]:
+    # Material and piece-square totals per color, indexed by chess.WHITE/chess.BLACK
+    material = [0, 0]
+    pst = [0, 0]
+    for color in chess.COLORS:
+        for piece_type in chess.PIECE_TYPES:
+            for square in chess.scan_forward(board.pieces_mask(piece_type, color)):
+                material[color] += PIECE_VALUES[piece_type]
+                pst[color] += PST_BONUS[color][piece_type][square]
+    return material, pst
+
 
 class VariantBoard(chess.Board):
-    def __init__(self):
-        super().__init__()
-        # Track pawns that have used their special double move
-        self.double_moved_pawns: Set[int] = set()
+    # Check the incremental state against a full recomputation on every push/pop
+    debug_incremental = False
 
-    def is_legal_variant_move(self, move: chess.Move) -> bool:
-        # Check if it's a pawn move
-        if not self.piece_type_at(move.from_square) == chess.PAWN:
-            return self.is_legal(move)
-
-        # Check if it's a double move (two ranks)
-        if abs(chess.square_rank(move.from_square) - chess.square_rank(move.to_square)) == 2:
-            # Check if pawn hasn't used double move yet
-            if move.from_square not in self.double_moved_pawns:
-                return True
-            return False
+    def __init__(self, fen: Optional[str] = chess.STARTING_FEN, *, chess960: bool = False):
+        # 64-bit Zobrist key and material/piece-square totals per color (PST in
+        # table units), kept up to date by push/pop
+        self.zobrist_key = 0
+        self.material = [0, 0]
+        self.pst = [0, 0]
+        # Squares of the pawns that have used their special double move; the
+        # mark moves along with the pawn
+        self.double_moved = chess.BB_EMPTY
+        # Undo entries for pop(): previous key, double move mask, material and PST totals
+        self._variant_stack: List[Tuple[int, int, List[int], List[int]]] = []
+        super().__init__(fen, chess960=chess960)
+
+    @property
+    def double_moved_pawns(self) -> Set[int]:
+        return set(chess.scan_forward(self.double_moved))
+
+    @double_moved_pawns.setter
+    def double_moved_pawns(self, squares: Set[int]) -> None:
+        self.double_moved = chess.SquareSet(squares).mask & self.pawns
+        self.zobrist_key = self.compute_zobrist_key()
+
+    def compute_zobrist_key(self) -> int:
+        # Full recomputation, used to (re)initialize and to verify the incremental key
+        key = 0
+        for color in chess.COLORS:
+            for piece_type in chess.PIECE_TYPES:
+                for square in chess.scan_forward(self.pieces_mask(piece_type, color)):
+                    key ^= ZOBRIST_PIECES[color][piece_type][square]
+        for square in chess.scan_forward(self.double_moved):
+            key ^= ZOBRIST_DOUBLE_MOVED[square]
+        return key ^ self._state_key()
+
+    def _state_key(self) -> int:
+        # Side to move, castling rights and en passant file
+        key = ZOBRIST_CASTLING[_castling_index(self.castling_rights)]
+        if self.ep_square is not None:
+            key ^= ZOBRIST_EP_FILES[self.ep_square & 7]
+        if not self.turn:
+            key ^= ZOBRIST_BLACK_TO_MOVE
+        return key
+
+    def verify_incremental(self) -> None:
+        assert self.zobrist_key == self.compute_zobrist_key(), "zobrist key out of sync"
+        material, pst = compute_material_pst(self)
+        assert self.material == material, "material totals out of sync"
+        assert self.pst == pst, "piece-square totals out of sync"
+        assert not self.double_moved & ~self.pawns, "double move mark without a pawn"
+
+    # push() only changes pieces through these two primitives, so hooking them
+    # keeps the incremental state correct for captures, promotions, castling,
+    # en passant and variant double moves
+    def _remove_piece_at(self, square: chess.Square) -> Optional[chess.PieceType]:
+        color = bool(self.occupied_co[chess.WHITE] & chess.BB_SQUARES[square])
+        piece_type = super()._remove_piece_at(square)
+        if piece_type:
+            self.zobrist_key ^= ZOBRIST_PIECES[color][piece_type][square]
+            self.material[color] -= PIECE_VALUES[piece_type]
+            self.pst[color] -= PST_BONUS[color][piece_type][square]
+        return piece_type
+
+    def _set_piece_at(self, square: chess.Square, piece_type: chess.PieceType,
+                      color: chess.Color, promoted: bool = False) -> None:
+        super()._set_piece_at(square, piece_type, color, promoted)
+        self.zobrist_key ^= ZOBRIST_PIECES[color][piece_type][square]
+        self.material[color] += PIECE_VALUES[piece_type]
+        self.pst[color] += PST_BONUS[color][piece_type][square]
+
+    def reset(self) -> None:
+        self.double_moved = chess.BB_EMPTY
+        super().reset()
+
+    def clear(self) -> None:
+        self.double_moved = chess.BB_EMPTY
+        super().clear()
+
+    def set_fen(self, fen: str) -> None:
+        # Accepts an optional seventh field listing the pawns that have used
+        # their double move, as written by variant_fen()
+        parts = fen.split()
+        double_moved = chess.BB_EMPTY
+        if len(parts) == 7:
+            field = parts.pop()
+            if field != "-":
+                for i in range(0, len(field), 2):
+                    double_moved |= chess.BB_SQUARES[chess.parse_square(field[i:i + 2])]
+        self.double_moved = chess.BB_EMPTY
+        super().set_fen(" ".join(parts))
+        if double_moved & ~self.pawns:
+            raise ValueError(f"double move marks on squares without pawns: {fen!r}")
+        self.double_moved = double_moved
+        self.zobrist_key = self.compute_zobrist_key()
+
+    def variant_fen(self) -> str:
+        # FEN with a seventh field for the used double moves, e.g. "e4d5" or "-"
+        squares = "".join(chess.square_name(square) for square in chess.scan_forward(self.double_moved))
+        return f"{self.fen()} {squares or '-'}"
+
+    def clear_stack(self) -> None:
+        # Every setup method of chess.Board ends here, so rebuild the key from scratch
+        super().clear_stack()
+        self._variant_stack = []
+        self.double_moved &= self.pawns
+        self._recompute_incremental()
+
+    def _recompute_incremental(self) -> None:
+        self.zobrist_key = self.compute_zobrist_key()
+        self.material, self.pst = compute_material_pst(self)
+
+    def apply_transform(self, f) -> None:
+        # The marks move first: chess.Board's apply_transform ends in
+        # clear_stack(), which drops marks that have no pawn under them
+        self.double_moved = f(self.double_moved)
+        super().apply_transform(f)
+        self._recompute_incremental()
+
+    def apply_mirror(self) -> None:
+        super().apply_mirror()
+        self._recompute_incremental()
+
+    def copy(self, *, stack=True) -> "VariantBoard":
+        board = super().copy(stack=stack)
+        board.double_moved = self.double_moved
+        board.zobrist_key = self.zobrist_key
+        board.material = self.material[:]
+        board.pst = self.pst[:]
+        if stack:
+            stack = len(self.move_stack) if stack is True else stack
+            board._variant_stack = self._variant_stack[-stack:]
+        return board
 
+    def root(self) -> "VariantBoard":
+        board = super().root()
+        if self._variant_stack:
+            board.double_moved = self._variant_stack[0][1]
+            board._recompute_incremental()
+        return board
+
+    def _transposition_key(self):
+        # Repetition detection must tell apart pawns with and without a double move left
+        return super()._transposition_key(), self.double_moved
+
+    def _generate_variant_double_moves(self, from_mask: chess.Bitboard = chess.BB_ALL,
+                                       to_mask: chess.Bitboard = chess.BB_ALL) -> Iterator[chess.Move]:
+        # Legal double moves from any rank other than the starting one, which
+        # python-chess already generates
+        occupied = self.occupied
+        if self.turn == chess.WHITE:
+            pawns = self.pawns & self.occupied_co[chess.WHITE] & ~self.double_moved & ~chess.BB_RANK_2 & from_mask
+            targets = ((((pawns << 8) & ~occupied) << 8) & ~occupied & chess.BB_ALL) & to_mask
+            offset = -16
+        else:
+            pawns = self.pawns & self.occupied_co[chess.BLACK] & ~self.double_moved & ~chess.BB_RANK_7 & from_mask
+            targets = (((pawns >> 8) & ~occupied) >> 8) & ~occupied & to_mask
+            offset = 16
+        if not targets:
+            return
+
+        king = self.king(self.turn)
+        if king is not None:
+            checkers = self.checkers_mask()
+            if checkers:
+                # A pawn push can only answer a single slider check by blocking it
+                if chess.popcount(checkers) > 1:
+                    return
+                targets &= chess.between(king, chess.msb(checkers))
+            blockers = self._slider_blockers(king)
+
+        for to_square in chess.scan_reversed(targets):
+            from_square = to_square + offset
+            # Pinned pawns may only move along the pin
+            if king is not None and blockers & chess.BB_SQUARES[from_square] and \
+                    not chess.ray(from_square, to_square) & chess.BB_SQUARES[king]:
+                continue
+            if chess.BB_SQUARES[to_square] & chess.BB_BACKRANKS:
+                for promotion in (chess.QUEEN, chess.ROOK, chess.BISHOP, chess.KNIGHT):
+                    yield chess.Move(from_square, to_square, promotion)
+            else:
+                yield chess.Move(from_square, to_square)
+
+    def generate_variant_moves(self, from_mask: chess.Bitboard = chess.BB_ALL,
+                               to_mask: chess.Bitboard = chess.BB_ALL) -> Iterator[chess.Move]:
+        # All legal moves, including the any-rank pawn double moves
+        yield from super().generate_legal_moves(from_mask, to_mask)
+        if not self.is_variant_end():
+            yield from self._generate_variant_double_moves(from_mask, to_mask)
+
+    def generate_legal_moves(self, from_mask: chess.Bitboard = chess.BB_ALL,
+                             to_mask: chess.Bitboard = chess.BB_ALL) -> Iterator[chess.Move]:
+        # legal_moves, move parsing and game end detection all go through here
+        return self.generate_variant_moves(from_mask, to_mask)
+
+    def _is_variant_double_move(self, move: chess.Move) -> bool:
+        return (abs(move.to_square - move.from_square) == 16 and
+                bool(self.pawns & chess.BB_SQUARES[move.from_square]) and
+                chess.square_rank(move.from_square) != (1 if self.turn == chess.WHITE else 6))
+
+    def is_pseudo_legal(self, move: chess.Move) -> bool:
+        if move and self._is_variant_double_move(move):
+            return move in self._generate_variant_double_moves(chess.BB_SQUARES[move.from_square],
+                                                               chess.BB_SQUARES[move.to_square])
+        return super().is_pseudo_legal(move)
+
+    def is_legal(self, move: chess.Move) -> bool:
+        if move and self._is_variant_double_move(move):
+            return self.is_pseudo_legal(move)
+        return super().is_legal(move)
+
+    def is_legal_variant_move(self, move: chess.Move) -> bool:
         return self.is_legal(move)
 
     def push(self, move: chess.Move) -> None:
-        # Track double moves
-        if self.piece_type_at(move.from_square) == chess.PAWN:
-            if abs(chess.square_rank(move.from_square) - chess.square_rank(move.to_square)) == 2:
-                self.double_moved_pawns.add(move.from_square)
+        # Carry the double move marks along with the pawns
+        double_moved = self.double_moved
+        self._variant_stack.append((self.zobrist_key, double_moved, self.material, self.pst))
+        self.material = self.material[:]
+        self.pst = self.pst[:]
+
+        if move:
+            from_bb = chess.BB_SQUARES[move.from_square]
+            to_bb = chess.BB_SQUARES[move.to_square]
+            # A captured pawn takes its mark with it
+            double_moved &= ~to_bb
+            if self.pawns & from_bb:
+                if move.to_square == self.ep_square and not self.occupied & to_bb:
+                    double_moved &= ~chess.BB_SQUARES[move.to_square + (-8 if self.turn == chess.WHITE else 8)]
+                if double_moved & from_bb or abs(move.to_square - move.from_square) == 16:
+                    double_moved = (double_moved & ~from_bb) | to_bb
+                if move.promotion:
+                    double_moved &= ~to_bb
+
+        self.zobrist_key ^= self._state_key()
         super().push(move)
+        self.zobrist_key ^= self._state_key()
+
+        for square in chess.scan_forward(double_moved ^ self.double_moved):
+            self.zobrist_key ^= ZOBRIST_DOUBLE_MOVED[square]
+        self.double_moved = double_moved
+
+        if self.debug_incremental:
+            self.verify_incremental()
+
+    def pop(self) -> chess.Move:
+        move = super().pop()
+        self.zobrist_key, self.double_moved, self.material, self.pst = self._variant_stack.pop()
+        if self.debug_incremental:
+            self.verify_incremental()
+        return move
+
+    def perft(self, depth: int) -> int:
+        # Number of leaf nodes of the legal move tree, with bulk counting at the last ply
+        if depth <= 0:
+            return 1
+        if depth == 1:
+            return sum(1 for _ in self.generate_variant_moves())
+        nodes = 0
+        for move in list(self.generate_variant_moves()):
+            self.push(move)
+            nodes += self.perft(depth - 1)
+            self.pop()
+        return nodes
+
+    def divide(self, depth: int) -> Dict[str, int]:
+        # perft() split by root move, for tracking down move generation bugs
+        counts = {}
+        for move in list(self.generate_variant_moves()):
+            self.push(move)
+            counts[move.uci()] = self.perft(depth - 1)
+            self.pop()
+        return counts
+
+
+class MainlineVisitor(chess.pgn.BaseVisitor):
+    # Collects headers and mainline SAN without playing the moves: the
+    # python-chess board would reject variant double moves, so callers replay
+    # the SAN on a VariantBoard (chess.pgn.read_game(f, Visitor=MainlineVisitor))
+    def begin_game(self) -> None:
+        self.headers: Dict[str, str] = {}
+        self.san: List[str] = []
+        self.error: Optional[str] = None
+
+    def visit_header(self, tagname: str, tagvalue: str) -> None:
+        self.headers[tagname] = tagvalue
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def begin_parse_san(self, board: chess.Board, san: str):
+        self.san.append(san)
+        return chess.pgn.SKIP
+
+    def handle_error(self, error: Exception) -> None:
+        self.error = self.error or str(error)
+
+    def result(self) -> "MainlineVisitor":
+        return self
+
 
 class ChessGame:
     def __init__(self):
@@ -60,4 +372,4 @@ class ChessGame:
             return "*"
         if self.board.is_checkmate():
             return "1-0" if self.board.turn else "0-1"
-        return "1/2-1/2"
\ No newline at end of file
+        return "1/2-1/2"
@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from game import VariantBoard
+
+# Drives server.py with N concurrent sessions playing random legal moves and
+# reports the latency of the move requests (user move + AI reply).
+
+
+class Client:
+    # Minimal keep-alive HTTP/JSON client over asyncio streams
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+
+    async def request(self, method: str, path: str, body: Optional[Dict] = None) -> Tuple[int, Dict]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        data = json.dumps(body).encode() if body is not None else b""
+        self.writer.write((f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+                           f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n").encode()
+                          + data)
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode().partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        payload = await self.reader.readexactly(length) if length else b""
+        return status, json.loads(payload) if payload else {}
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            await self.writer.wait_closed()
+
+
+async def play_session(client: Client, moves: int, move_time: float, rng: random.Random,
+                       latencies: List[float], counters: Dict[str, int]) -> None:
+    status, state = await client.request("POST", "/sessions", {"move_time": move_time})
+    if status != 201:
+        counters["errors"] += 1
+        return
+    session_id = state["session_id"]
+    board = VariantBoard(state["variant_fen"])
+
+    played = 0
+    while played < moves and not board.is_game_over():
+        move = rng.choice(list(board.legal_moves))
+        start = time.perf_counter()
+        status, state = await client.request("POST", f"/sessions/{session_id}/move", {"move": move.uci()})
+        if status == 503:
+            # Backpressure: back off and retry the same move
+            counters["rejected"] += 1
+            await asyncio.sleep(0.1 + rng.random() * 0.4)
+            continue
+        if status != 200:
+            counters["errors"] += 1
+            break
+        latencies.append(time.perf_counter() - start)
+        board = VariantBoard(state["variant_fen"])
+        played += 1
+    await client.request("DELETE", f"/sessions/{session_id}")
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else 0.0
+
+
+async def run(host: str, port: int, sessions: int, moves: int, move_time: float, seed: int) -> None:
+    latencies: List[float] = []
+    counters = {"rejected": 0, "errors": 0}
+    clients = [Client(host, port) for _ in range(sessions)]
+    start = time.perf_counter()
+    await asyncio.gather(*(play_session(client, moves, move_time, random.Random(seed + i), latencies, counters)
+                           for i, client in enumerate(clients)))
+    elapsed = time.perf_counter() - start
+    _, stats = await clients[0].request("GET", "/stats")
+    for client in clients:
+        await client.close()
+
+    print(f"{sessions} sessions, {len(latencies)} moves in {elapsed:.1f}s "
+          f"({len(latencies) / elapsed:.1f} moves/sec)")
+    print(f"move latency p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+          f"p99 {percentile(latencies, 0.99) * 1000:.0f} ms, max {max(latencies, default=0) * 1000:.0f} ms")
+    print(f"503 rejections {counters['rejected']}, errors {counters['errors']}, server {stats}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test for server.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent sessions")
+    parser.add_argument("--moves", type=int, default=10, help="moves per session")
+    parser.add_argument("--move-time", type=float, default=0.2, help="AI time per move in seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args.host, args.port, args.sessions, args.moves, args.move_time, args.seed))
+
+
+if __name__ == "__main__":
+    main()
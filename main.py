@@ -1,25 +1,72 @@
+import os
+import queue
+import threading
+import chess
 from game import ChessGame
-from ai import ChessAI
-from typing import Dict, Optional
+from ai import ChessAI, MAX_DEPTH
+from typing import Dict, Optional, Any
+
+# Per-move thinking time for the AI, in seconds
+AI_TIME_LIMIT = 2.0
+# Opening book used when present (build with `python book.py build book.bin --selfplay N`)
+BOOK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "book.bin")
+# Transposition table snapshot, saved on shutdown and mapped back in on startup
+HASH_PATH = os.path.join(os.path.expanduser("~"), ".chess_variant_hash.bin")
 
 class GameManager:
-    def __init__(self):
+    def __init__(self, time_limit: float = AI_TIME_LIMIT, ponder: bool = False,
+                 hash_path: Optional[str] = HASH_PATH):
         self.game = None
         self.ai = None
+        self.time_limit = time_limit
+        # Search on the expected reply while the user is thinking
+        self.ponder = ponder
+        self.hash_path = hash_path
+
+        # Background search: one worker thread at a time, results handed back
+        # through a queue that the GUI drains from its own thread with poll()
+        self._thread: Optional[threading.Thread] = None
+        self._results: "queue.Queue" = queue.Queue()
+        self._search_id = 0
+        self._ponder_move: Optional[chess.Move] = None
+        self._awaiting_reply = False
 
     def start_new_game(self) -> None:
+        self.cancel_search()
         self.game = ChessGame()
-        self.ai = ChessAI(depth=2)
+        # One engine for the whole session, so its table stays warm between games
+        if self.ai is None:
+            self.ai = ChessAI(depth=2, book=BOOK_PATH if os.path.exists(BOOK_PATH) else None)
+            if self.hash_path:
+                self.ai.load_hash(self.hash_path)
+        else:
+            self.ai.new_game()
+
+    def shutdown(self) -> None:
+        # Saves the table for the next start and releases the engine
+        self.cancel_search()
+        if self.ai is None:
+            return
+        if self.hash_path:
+            try:
+                self.ai.save_hash(self.hash_path)
+            except OSError:
+                pass
+        self.ai.close()
+        self.ai = None
 
     def make_user_move(self, uci: str) -> Dict[str, str]:
+        # Blocking version: applies the user's move and searches the reply on
+        # the calling thread
         if not self.game:
             raise RuntimeError("Game not started")
 
+        self.cancel_search()
         if not self.game.apply_user_move(uci):
             raise ValueError("Invalid move")
 
         # Get AI's response
-        ai_move = self.ai.get_best_move(self.game.board)
+        ai_move = self.ai.get_best_move(self.game.board, time_limit=self.time_limit)
         ai_move_uci = self.game.apply_ai_move(ai_move)
 
         return {
@@ -29,6 +76,113 @@ class GameManager:
             "result": self.game.get_result()
         }
 
+    def submit_user_move(self, uci: str) -> bool:
+        # Applies the user's move and starts the AI reply in the background.
+        # Returns False when the game ended with the user's move.
+        if not self.game:
+            raise RuntimeError("Game not started")
+        if self.is_thinking():
+            raise RuntimeError("AI is still thinking")
+
+        move = chess.Move.from_uci(uci)
+        ponder_hit = self._ponder_move is not None and move == self._ponder_move and self._thread_alive()
+        if not ponder_hit:
+            self.cancel_search()
+        if not self.game.apply_user_move(uci):
+            raise ValueError("Invalid move")
+        if self.game.is_game_over():
+            self.cancel_search()
+            return False
+
+        self._awaiting_reply = True
+        if ponder_hit:
+            # The running ponder search already explores this position
+            self._ponder_move = None
+            self.ai.ponderhit(self.time_limit)
+        else:
+            self._start_search(self.game.board.copy(), self.time_limit)
+        return True
+
+    def poll(self) -> Optional[Dict[str, Any]]:
+        # Called from the GUI thread. Returns the AI's move once the search has
+        # finished, applied to the game, or None while it is still thinking.
+        while True:
+            try:
+                search_id, move = self._results.get_nowait()
+            except queue.Empty:
+                return None
+            # Results of cancelled searches are dropped
+            if search_id == self._search_id and self._awaiting_reply and move is not None:
+                break
+
+        self._awaiting_reply = False
+        self._thread = None
+        ai_move_uci = self.game.apply_ai_move(move)
+        result = {
+            "ai_move": ai_move_uci,
+            "fen": self.game.get_board_fen(),
+            "is_game_over": self.game.is_game_over(),
+            "result": self.game.get_result()
+        }
+        if self.ponder and not result["is_game_over"]:
+            self._start_ponder()
+        return result
+
+    def is_thinking(self) -> bool:
+        # True while the AI is searching its reply (pondering doesn't count)
+        return self._awaiting_reply
+
+    def search_info(self) -> Dict[str, Any]:
+        # Live progress of the running search for the thinking indicator
+        ai = self.ai
+        return {
+            "thinking": self._awaiting_reply,
+            "pondering": self._ponder_move is not None and self._thread_alive(),
+            "depth": ai.completed_depth if ai else 0,
+            "nodes": ai.nodes + ai.qnodes if ai else 0,
+        }
+
+    def cancel_search(self) -> None:
+        # Stops a running search or ponder and discards its result
+        self._search_id += 1
+        self._awaiting_reply = False
+        self._ponder_move = None
+        thread = self._thread
+        self._thread = None
+        # The search clears the stop request when it starts, so repeat it until
+        # the thread has actually finished
+        while thread is not None and thread.is_alive():
+            self.ai.stop()
+            thread.join(0.05)
+
+    def _thread_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _start_search(self, board, time_limit: Optional[float], max_depth: Optional[int] = None) -> None:
+        self._search_id += 1
+        search_id = self._search_id
+        ai = self.ai
+
+        def run() -> None:
+            move = ai.get_best_move(board, time_limit=time_limit, max_depth=max_depth)
+            self._results.put((search_id, move))
+
+        self._thread = threading.Thread(target=run, name="ai-search", daemon=True)
+        self._thread.start()
+
+    def _start_ponder(self) -> None:
+        # Search the position after the reply the AI expects, without limits,
+        # until the user moves
+        if len(self.ai.pv) < 2 or not self.game.board.is_legal(self.ai.pv[1]):
+            return
+        self._ponder_move = self.ai.pv[1]
+        board = self.game.board.copy()
+        board.push(self._ponder_move)
+        if board.is_game_over():
+            self._ponder_move = None
+            return
+        self._start_search(board, None, MAX_DEPTH)
+
     def get_board_state(self) -> str:
         if not self.game:
             raise RuntimeError("Game not started")
@@ -37,4 +191,4 @@ class GameManager:
     def get_last_ai_move(self) -> Optional[str]:
         if not self.game or not self.game.last_move:
             return None
-        return self.game.last_move.uci()
\ No newline at end of file
+        return self.game.last_move.uci()
@@ -0,0 +1,158 @@
+import chess
+from typing import Iterator, Optional
+
+# Piece values for exchange evaluation; the king is never really traded
+SEE_VALUES = [0, 100, 320, 330, 500, 900, 20000]
+
+
+def captured_piece_type(board: chess.Board, move: chess.Move) -> int:
+    # Piece type taken by a capture (a pawn for en passant), 0 for quiet moves
+    piece_type = board.piece_type_at(move.to_square)
+    if piece_type:
+        return piece_type
+    if move.to_square == board.ep_square and board.pawns & chess.BB_SQUARES[move.from_square]:
+        return chess.PAWN
+    return 0
+
+
+def mvv_lva(board: chess.Board, move: chess.Move) -> int:
+    # Most valuable victim first, least valuable attacker breaks ties
+    return captured_piece_type(board, move) * 8 - (board.piece_type_at(move.from_square) or 0)
+
+
+def attackers_to(board: chess.Board, square: chess.Square, occupied: int) -> int:
+    # Attackers of both colors for a given occupancy, so x-rays appear as pieces are removed
+    rooks_queens = board.rooks | board.queens
+    bishops_queens = board.bishops | board.queens
+    return occupied & (
+        (chess.BB_KNIGHT_ATTACKS[square] & board.knights) |
+        (chess.BB_KING_ATTACKS[square] & board.kings) |
+        (chess.BB_PAWN_ATTACKS[chess.BLACK][square] & board.pawns & board.occupied_co[chess.WHITE]) |
+        (chess.BB_PAWN_ATTACKS[chess.WHITE][square] & board.pawns & board.occupied_co[chess.BLACK]) |
+        (chess.BB_RANK_ATTACKS[square][chess.BB_RANK_MASKS[square] & occupied] & rooks_queens) |
+        (chess.BB_FILE_ATTACKS[square][chess.BB_FILE_MASKS[square] & occupied] & rooks_queens) |
+        (chess.BB_DIAG_ATTACKS[square][chess.BB_DIAG_MASKS[square] & occupied] & bishops_queens))
+
+
+def static_exchange(board: chess.Board, move: chess.Move) -> int:
+    # Material balance of the capture sequence on the target square (swap algorithm)
+    to_square = move.to_square
+    attacker = board.piece_type_at(move.from_square)
+    victim = captured_piece_type(board, move)
+
+    occupied = board.occupied ^ chess.BB_SQUARES[move.from_square]
+    if victim and not board.occupied & chess.BB_SQUARES[to_square]:
+        # En passant: the captured pawn is not on the target square
+        occupied ^= chess.BB_SQUARES[to_square + (-8 if board.turn else 8)]
+
+    gains = [SEE_VALUES[victim]]
+    side = not board.turn
+    while True:
+        gains.append(SEE_VALUES[attacker] - gains[-1])
+        if max(-gains[-2], gains[-1]) < 0:
+            break
+        candidates = attackers_to(board, to_square, occupied) & board.occupied_co[side]
+        if not candidates:
+            break
+        for piece_type in chess.PIECE_TYPES:
+            bb = candidates & board.pieces_mask(piece_type, side)
+            if bb:
+                attacker = piece_type
+                occupied ^= bb & -bb
+                break
+        side = not side
+
+    # The last entry is a speculative recapture that never happened
+    gains.pop()
+    while len(gains) > 1:
+        last = gains.pop()
+        gains[-1] = -max(-gains[-1], last)
+    return gains[0]
+
+
+MAX_PLY = 128
+# History scores are halved once any of them passes this value
+HISTORY_LIMIT = 1 << 20
+
+
+class OrderingTables:
+    def __init__(self):
+        # Two killer moves per ply and a [color][from][to] history table
+        self.killers = [[None, None] for _ in range(MAX_PLY)]
+        self.history = [[[0] * 64 for _ in range(64)] for _ in chess.COLORS]
+
+    def new_search(self) -> None:
+        # Killers are position specific; history is kept but decays
+        for killers in self.killers:
+            killers[0] = killers[1] = None
+        self._scale_history()
+
+    def _scale_history(self) -> None:
+        for table in self.history:
+            for row in table:
+                for to_square in range(64):
+                    row[to_square] //= 2
+
+    def record_cutoff(self, board: chess.Board, move: chess.Move, depth: int, ply: int) -> None:
+        # Only quiet moves are remembered; captures are ordered by MVV-LVA anyway
+        if captured_piece_type(board, move) or move.promotion:
+            return
+        killers = self.killers[ply]
+        if killers[0] != move:
+            killers[1] = killers[0]
+            killers[0] = move
+        row = self.history[board.turn][move.from_square]
+        row[move.to_square] += depth * depth
+        if row[move.to_square] > HISTORY_LIMIT:
+            self._scale_history()
+
+
+class MovePicker:
+    # Yields legal moves in stages so a cutoff on an early move skips the
+    # generation and sorting of the rest:
+    # hash move, good captures, killers, quiet moves by history, losing captures
+    def __init__(self, board: chess.Board, hash_move: Optional[chess.Move],
+                 tables: OrderingTables, ply: int):
+        self.board = board
+        self.hash_move = hash_move
+        self.tables = tables
+        self.ply = ply
+
+    def __iter__(self) -> Iterator[chess.Move]:
+        board = self.board
+        hash_move = self.hash_move
+        if hash_move is not None and board.is_legal(hash_move):
+            yield hash_move
+        else:
+            hash_move = None
+
+        # Captures and queen promotions, best victims first
+        enemy = board.occupied_co[not board.turn]
+        own_pawns = board.pawns & board.occupied_co[board.turn]
+        captures = list(board.generate_legal_captures())
+        captures.extend(board.generate_legal_moves(own_pawns, chess.BB_BACKRANKS & ~board.occupied))
+        captures.sort(key=lambda m: mvv_lva(board, m) + (m.promotion or 0) * 64, reverse=True)
+        losing = []
+        for move in captures:
+            if move == hash_move:
+                continue
+            if (not move.promotion and SEE_VALUES[captured_piece_type(board, move)] <
+                    SEE_VALUES[board.piece_type_at(move.from_square)] and static_exchange(board, move) < 0):
+                losing.append(move)
+                continue
+            yield move
+
+        killers = [move for move in self.tables.killers[self.ply]
+                   if move is not None and move != hash_move and board.is_legal(move)
+                   and not board.is_capture(move) and not move.promotion]
+        yield from killers
+
+        # Quiet moves, excluding en passant and promotions handled above
+        history = self.tables.history[board.turn]
+        quiets = [move for move in board.generate_legal_moves(chess.BB_ALL, ~enemy)
+                  if move != hash_move and move not in killers and not move.promotion
+                  and not board.is_en_passant(move)]
+        quiets.sort(key=lambda m: history[m.from_square][m.to_square], reverse=True)
+        yield from quiets
+
+        yield from losing
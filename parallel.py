@@ -0,0 +1,81 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional
+
+import chess
+
+from game import VariantBoard
+from transposition import SharedTranspositionTable
+
+# Per-process state of a helper worker, set up once by _init_worker
+_worker_ai = None
+
+
+def _init_worker(table_name: str, size_mb: float, stop_flag) -> None:
+    # Imported here: ai imports this module to start the helpers
+    from ai import ChessAI
+    global _worker_ai
+    _worker_ai = ChessAI(hash_mb=0)
+    _worker_ai.transposition_table = SharedTranspositionTable(size_mb, name=table_name)
+    _worker_ai.stop_flag = stop_flag
+
+
+def _helper_search(fen: str, moves: List[str], start_depth: int, max_depth: int, generation: int) -> int:
+    board = VariantBoard(fen)
+    for uci in moves:
+        board.push(chess.Move.from_uci(uci))
+    _worker_ai.transposition_table.generation = generation
+    return _worker_ai.helper_search(board, start_depth, max_depth)
+
+
+class HelperPool:
+    # Lazy SMP helpers: extra processes search the same root position at
+    # staggered depths and share results only through the transposition table.
+    # The main process runs the normal search and its result is the one played.
+    def __init__(self, helpers: int, size_mb: float):
+        context = multiprocessing.get_context()
+        self.helpers = helpers
+        self.table = SharedTranspositionTable(size_mb)
+        self.stop_flag = context.RawValue('b', 0)
+        try:
+            self.executor = ProcessPoolExecutor(helpers, mp_context=context, initializer=_init_worker,
+                                                initargs=(self.table.name, size_mb, self.stop_flag))
+            # Start the workers now, on the creating thread. Forked later from
+            # a search thread, a child can inherit a lock held by another
+            # thread (e.g. one blocked reading stdin) and hang on startup.
+            self.executor.submit(int).result()
+        except Exception:
+            self.table.close()
+            raise
+        self._futures = []
+
+    def start(self, board: VariantBoard, max_depth: int, generation: int) -> None:
+        self.stop_flag.value = 0
+        fen = board.root().variant_fen()
+        moves = [move.uci() for move in board.move_stack]
+        # Odd helpers run one ply ahead so the workers fill different parts of the tree
+        self._futures = [self.executor.submit(_helper_search, fen, moves, 1 + i % 2, max_depth + 1, generation)
+                         for i in range(self.helpers)]
+
+    def stop(self) -> int:
+        # Returns the number of nodes searched by the helpers
+        self.stop_flag.value = 1
+        nodes = sum(future.result() for future in self._futures)
+        self._futures = []
+        return nodes
+
+    def close(self) -> None:
+        self.stop_flag.value = 1
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.table.close()
+
+
+def create_helpers(workers: int, size_mb: float) -> Optional[HelperPool]:
+    # None means a plain single-process search, also used as the fallback when
+    # shared memory or worker processes are unavailable on this platform
+    if workers <= 1:
+        return None
+    try:
+        return HelperPool(workers - 1, size_mb)
+    except (OSError, ImportError, NotImplementedError):
+        return None
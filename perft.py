@@ -0,0 +1,74 @@
+import argparse
+import time
+from typing import List, Tuple
+
+from game import VariantBoard
+
+# Reference node counts for the variant rules (any-rank pawn double moves).
+# FENs may carry a seventh field listing the pawns that already used theirs.
+POSITIONS: List[Tuple[str, str, List[int]]] = [
+    ("start", "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+     [20, 400, 9054, 203761, 5145804]),
+    ("kiwipete", "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+     [48, 2082, 99997, 4255062]),
+    ("rook-endgame", "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+     [14, 207, 3142, 52798, 868021]),
+    ("promotions", "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+     [44, 1493, 62779, 2142762]),
+    ("advanced-pawns", "4k3/8/8/8/2P2p2/4P3/8/4K2r w - - 0 1 -",
+     [3, 65, 565, 11263, 99404]),
+    ("used-doubles", "r1bqkbnr/pp1p1ppp/2n5/2p1p3/4P3/3P1N2/PPP2PPP/RNBQKB1R w KQkq - 0 4 e4c5",
+     [32, 1023, 32850, 1053653]),
+    ("lone-pawn", "4k3/8/8/8/8/8/4P3/4K3 w - - 0 1 -",
+     [6, 30, 215, 1454, 11333]),
+]
+
+
+def run_suite(max_depth: int) -> bool:
+    ok = True
+    total_nodes = 0
+    total_time = 0.0
+    for name, fen, counts in POSITIONS:
+        board = VariantBoard(fen)
+        for depth, expected in enumerate(counts[:max_depth], 1):
+            start = time.perf_counter()
+            nodes = board.perft(depth)
+            elapsed = time.perf_counter() - start
+            total_nodes += nodes
+            total_time += elapsed
+            status = "ok" if nodes == expected else f"FAIL (expected {expected:,})"
+            ok &= nodes == expected
+            print(f"{name:<16} depth {depth}: {nodes:>10,} nodes "
+                  f"{nodes / elapsed if elapsed else 0:>12,.0f} nodes/sec  {status}")
+    print(f"total: {total_nodes:,} nodes in {total_time:.2f}s "
+          f"({total_nodes / total_time if total_time else 0:,.0f} nodes/sec)")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Move generator perft for the variant rules")
+    parser.add_argument("--depth", type=int, default=3,
+                        help="maximum depth for the reference suite")
+    parser.add_argument("--fen", help="run on this position instead of the reference suite")
+    parser.add_argument("--divide", action="store_true",
+                        help="with --fen, print the node count below each root move")
+    args = parser.parse_args()
+
+    if args.fen is None:
+        raise SystemExit(0 if run_suite(args.depth) else 1)
+
+    board = VariantBoard(args.fen)
+    start = time.perf_counter()
+    if args.divide:
+        counts = board.divide(args.depth)
+        for move, nodes in sorted(counts.items()):
+            print(f"{move}: {nodes}")
+        nodes = sum(counts.values())
+    else:
+        nodes = board.perft(args.depth)
+    elapsed = time.perf_counter() - start
+    print(f"nodes: {nodes:,} in {elapsed:.2f}s ({nodes / elapsed if elapsed else 0:,.0f} nodes/sec)")
+
+
+if __name__ == "__main__":
+    main()
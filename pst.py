@@ -0,0 +1,46 @@
+import chess
+
+# Enhanced piece values with position-dependent scoring
+PIECE_VALUES = {
+    chess.PAWN: 100,
+    chess.KNIGHT: 320,
+    chess.BISHOP: 330,
+    chess.ROOK: 500,
+    chess.QUEEN: 900,
+    chess.KING: 20000
+}
+
+# Piece-Square Tables for positional evaluation, indexed by square for White
+# and by 63 - square for Black
+PAWN_TABLE = [
+    0,  0,  0,  0,  0,  0,  0,  0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5,  5, 10, 25, 25, 10,  5,  5,
+    0,  0,  0, 20, 20,  0,  0,  0,
+    5, -5,-10,  0,  0,-10, -5,  5,
+    5, 10, 10,-20,-20, 10, 10,  5,
+    0,  0,  0,  0,  0,  0,  0,  0
+]
+
+KNIGHT_TABLE = [
+    -50,-40,-30,-30,-30,-30,-40,-50,
+    -40,-20,  0,  0,  0,  0,-20,-40,
+    -30,  0, 10, 15, 15, 10,  0,-30,
+    -30,  5, 15, 20, 20, 15,  5,-30,
+    -30,  0, 15, 20, 20, 15,  0,-30,
+    -30,  5, 10, 15, 15, 10,  5,-30,
+    -40,-20,  0,  5,  5,  0,-20,-40,
+    -50,-40,-30,-30,-30,-30,-40,-50
+]
+
+# Table bonuses count a tenth of their listed value
+PST_SCALE = 0.1
+
+# PST_BONUS[color][piece_type][square], in table units (before PST_SCALE)
+PST_BONUS = [[[0] * 64 for _ in range(7)] for _ in chess.COLORS]
+for _color in chess.COLORS:
+    for _square in chess.SQUARES:
+        _index = _square if _color else 63 - _square
+        PST_BONUS[_color][chess.PAWN][_square] = PAWN_TABLE[_index]
+        PST_BONUS[_color][chess.KNIGHT][_square] = KNIGHT_TABLE[_index]
@@ -0,0 +1,83 @@
+import json
+import time
+from typing import Callable, Dict, List, Optional
+
+# Per-search statistics collected by ChessAI when enabled with
+# ai.enable_stats(sink). Disabled searches only pay for a few counters that
+# the search keeps anyway.
+
+# Beta cutoffs by the index of the move that caused them; the last bucket
+# collects everything from that index on
+CUTOFF_BUCKETS = 8
+EVAL_TERMS = ("material", "mobility", "center", "pawn_structure", "king_safety")
+
+
+class SearchStats:
+    def __init__(self, fen: str):
+        self.fen = fen
+        self.timestamp = time.time()
+        self.move: Optional[str] = None
+        # "search", "book" or "analysis"
+        self.source = "search"
+        self.score = 0.0
+        self.depth = 0
+        self.seconds = 0.0
+        self.nodes = 0
+        self.qnodes = 0
+        self.nodes_per_depth: List[int] = []
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.tt_cutoffs = 0
+        self.beta_cutoffs = 0
+        self.cutoff_histogram = [0] * CUTOFF_BUCKETS
+        self.bitbase_hits = 0
+        self.helper_nodes = 0
+        self.eval_calls = 0
+        # Seconds spent in each evaluation term
+        self.eval_time: Dict[str, float] = dict.fromkeys(EVAL_TERMS, 0.0)
+        self.pv: List[str] = []
+
+    def to_dict(self) -> Dict:
+        return {
+            "timestamp": self.timestamp,
+            "fen": self.fen,
+            "move": self.move,
+            "source": self.source,
+            "score": self.score,
+            "depth": self.depth,
+            "seconds": self.seconds,
+            "nodes": self.nodes,
+            "qnodes": self.qnodes,
+            "nodes_per_depth": self.nodes_per_depth,
+            "tt_probes": self.tt_probes,
+            "tt_hits": self.tt_hits,
+            "tt_hit_rate": self.tt_hits / self.tt_probes if self.tt_probes else 0.0,
+            "tt_cutoffs": self.tt_cutoffs,
+            "beta_cutoffs": self.beta_cutoffs,
+            "cutoff_histogram": self.cutoff_histogram,
+            "bitbase_hits": self.bitbase_hits,
+            "helper_nodes": self.helper_nodes,
+            "eval_calls": self.eval_calls,
+            "eval_time": self.eval_time,
+            "pv": self.pv,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict())
+
+
+class JsonLinesWriter:
+    # Stats sink appending one JSON object per search to a file
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "a")
+
+    def __call__(self, stats: SearchStats) -> None:
+        self._file.write(stats.to_json() + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+StatsSink = Callable[[SearchStats], None]
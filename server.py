@@ -0,0 +1,302 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import chess
+
+from game import ChessGame, VariantBoard
+from main import AI_TIME_LIMIT, BOOK_PATH
+
+# Headless multi-game service: HTTP/JSON on asyncio, AI searches in a bounded
+# process pool so the event loop only ever parses requests and moves boards.
+#   POST   /sessions               {"move_time": s, "budget": s} -> new game
+#   GET    /sessions/<id>          game state
+#   POST   /sessions/<id>/move     {"move": "e2e4"} -> user move + AI reply
+#   DELETE /sessions/<id>
+#   GET    /stats                  sessions, pool load, rejected requests
+
+# Total AI thinking time per session, and the share of it one move may use
+SESSION_BUDGET = 120.0
+MOVES_TO_GO = 20
+MIN_MOVE_TIME = 0.05
+IDLE_TIMEOUT = 600.0
+# Searches allowed to wait for a worker before new ones are turned away
+QUEUE_LIMIT = 4
+MAX_BODY = 1 << 16
+
+STATUS_TEXT = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+               405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+               500: "Internal Server Error", 503: "Service Unavailable"}
+
+# Engine of a pool worker, one per process, shared by the sessions it serves
+_worker_ai = None
+
+
+def _init_worker(hash_mb: float, book: Optional[str]) -> None:
+    from ai import ChessAI
+    global _worker_ai
+    _worker_ai = ChessAI(hash_mb=hash_mb, book=book)
+
+
+def _search(fen: str, moves: List[str], time_limit: float) -> Tuple[str, int, int, float]:
+    # Also returns the search's own time, which excludes the wait for a free worker
+    board = VariantBoard(fen)
+    for uci in moves:
+        board.push(chess.Move.from_uci(uci))
+    start = time.perf_counter()
+    move = _worker_ai.get_best_move(board, time_limit=time_limit)
+    seconds = time.perf_counter() - start
+    return move.uci(), _worker_ai.completed_depth, _worker_ai.nodes + _worker_ai.qnodes, seconds
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class Session:
+    def __init__(self, move_time: float, budget: float):
+        self.id = uuid.uuid4().hex
+        self.game = ChessGame()
+        self.move_time = move_time
+        self.budget = budget
+        self.last_active = time.monotonic()
+        self.busy = False
+
+    def state(self) -> Dict:
+        board = self.game.board
+        return {
+            "session_id": self.id,
+            "fen": board.fen(),
+            "variant_fen": board.variant_fen(),
+            "moves": [move.uci() for move in board.move_stack],
+            "is_game_over": self.game.is_game_over(),
+            "result": self.game.get_result(),
+            "budget_left": round(self.budget, 3),
+        }
+
+    def next_move_time(self) -> float:
+        # Clock-style allocation out of the remaining budget
+        return max(MIN_MOVE_TIME, min(self.move_time, self.budget / MOVES_TO_GO))
+
+
+class GameServer:
+    def __init__(self, workers: int = 2, hash_mb: float = 16, queue_limit: int = QUEUE_LIMIT,
+                 idle_timeout: float = IDLE_TIMEOUT, book: Optional[str] = None):
+        self.workers = workers
+        self.capacity = workers + queue_limit
+        self.idle_timeout = idle_timeout
+        self.executor = ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(hash_mb, book))
+        self.sessions: Dict[str, Session] = {}
+        self.in_flight = 0
+        self.rejected = 0
+        self.evicted = 0
+        self.searches = 0
+
+    # Request handlers, returning (status, body)
+
+    async def create_session(self, body: Dict) -> Tuple[int, Dict]:
+        try:
+            move_time = float(body.get("move_time", AI_TIME_LIMIT))
+            budget = float(body.get("budget", SESSION_BUDGET))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "move_time and budget must be numbers")
+        if move_time <= 0 or budget <= 0:
+            raise HTTPError(400, "move_time and budget must be positive")
+        session = Session(move_time, budget)
+        self.sessions[session.id] = session
+        return 201, session.state()
+
+    async def make_move(self, session: Session, body: Dict) -> Tuple[int, Dict]:
+        if session.busy:
+            raise HTTPError(409, "a move is already being processed for this session")
+        if session.game.is_game_over():
+            raise HTTPError(409, "game is over")
+        # Backpressure: refuse work the pool can't start soon
+        if self.in_flight >= self.capacity:
+            self.rejected += 1
+            raise HTTPError(503, "all engine workers are busy", {"Retry-After": "1"})
+        try:
+            if not session.game.apply_user_move(str(body["move"])):
+                raise HTTPError(400, "illegal move")
+        except KeyError:
+            raise HTTPError(400, "missing 'move'")
+
+        response = session.state()
+        if session.game.is_game_over():
+            return 200, response
+
+        board = session.game.board
+        root = board.root()
+        time_limit = session.next_move_time()
+        session.busy = True
+        self.in_flight += 1
+        start = time.monotonic()
+        try:
+            loop = asyncio.get_running_loop()
+            uci, depth, nodes, think_time = await loop.run_in_executor(
+                self.executor, _search, root.variant_fen(), response["moves"], time_limit)
+        except Exception as e:
+            # Take the user's move back so the session stays consistent
+            board.pop()
+            raise HTTPError(500, f"engine failure: {e}")
+        finally:
+            self.in_flight -= 1
+            session.busy = False
+        elapsed = time.monotonic() - start
+        self.searches += 1
+        # Only the search is charged to the session, not the time its request
+        # spent queued behind other sessions' searches
+        session.budget = max(0.0, session.budget - think_time)
+        session.last_active = time.monotonic()
+
+        session.game.apply_ai_move(chess.Move.from_uci(uci))
+        response = session.state()
+        response.update({"ai_move": uci, "depth": depth, "nodes": nodes, "think_time": round(think_time, 3),
+                         "queue_time": round(max(0.0, elapsed - think_time), 3)})
+        return 200, response
+
+    def stats(self) -> Dict:
+        return {
+            "sessions": len(self.sessions),
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "capacity": self.capacity,
+            "searches": self.searches,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+        }
+
+    async def dispatch(self, method: str, path: str, body: Dict) -> Tuple[int, Optional[Dict]]:
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        if parts == ["stats"] and method == "GET":
+            return 200, self.stats()
+        if parts == ["sessions"]:
+            if method != "POST":
+                raise HTTPError(405, "use POST to create a session")
+            return await self.create_session(body)
+        if len(parts) in (2, 3) and parts[0] == "sessions":
+            session = self.sessions.get(parts[1])
+            if session is None:
+                raise HTTPError(404, "unknown or expired session")
+            session.last_active = time.monotonic()
+            if len(parts) == 3 and parts[2] == "move" and method == "POST":
+                return await self.make_move(session, body)
+            if len(parts) == 2 and method == "GET":
+                return 200, session.state()
+            if len(parts) == 2 and method == "DELETE":
+                del self.sessions[session.id]
+                return 204, None
+            raise HTTPError(405, f"{method} not supported here")
+        raise HTTPError(404, "not found")
+
+    # Connection handling
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                except ValueError:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                extra_headers = {}
+                try:
+                    length = int(headers.get("content-length", 0))
+                    if length > MAX_BODY:
+                        raise HTTPError(413, "request body too large")
+                    raw = await reader.readexactly(length) if length else b""
+                    try:
+                        body = json.loads(raw) if raw else {}
+                    except ValueError:
+                        raise HTTPError(400, "body must be JSON")
+                    if not isinstance(body, dict):
+                        raise HTTPError(400, "body must be a JSON object")
+                    status, payload = await self.dispatch(method.upper(), path, body)
+                except HTTPError as e:
+                    status, payload, extra_headers = e.status, {"error": str(e)}, e.headers
+
+                keep_alive = headers.get("connection", "").lower() != "close"
+                self.write_response(writer, status, payload, keep_alive, extra_headers)
+                await writer.drain()
+                if not keep_alive or status == 413:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def write_response(writer: asyncio.StreamWriter, status: int, payload: Optional[Dict],
+                       keep_alive: bool, extra_headers: Dict[str, str]) -> None:
+        data = json.dumps(payload).encode() if payload is not None else b""
+        lines = [f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}",
+                 f"Content-Length: {len(data)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        if data:
+            lines.append("Content-Type: application/json")
+        lines.extend(f"{name}: {value}" for name, value in extra_headers.items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + data)
+
+    async def evict_idle(self) -> None:
+        # Drops sessions nobody has touched for idle_timeout seconds
+        while True:
+            await asyncio.sleep(min(60.0, self.idle_timeout / 2))
+            cutoff = time.monotonic() - self.idle_timeout
+            for session_id, session in list(self.sessions.items()):
+                if session.last_active < cutoff and not session.busy:
+                    del self.sessions[session_id]
+                    self.evicted += 1
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        evictor = asyncio.create_task(self.evict_idle())
+        print(f"serving on http://{host}:{port} with {self.workers} engine workers")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+            self.executor.shutdown(cancel_futures=True)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Headless HTTP/JSON game server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=2, help="engine processes")
+    parser.add_argument("--hash", type=float, default=16, help="transposition table MB per worker")
+    parser.add_argument("--queue-limit", type=int, default=QUEUE_LIMIT,
+                        help="searches allowed to wait for a worker before returning 503")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="seconds before an untouched session is evicted")
+    parser.add_argument("--no-book", action="store_true", help="don't use the opening book")
+    args = parser.parse_args()
+
+    book = None if args.no_book or not os.path.exists(BOOK_PATH) else BOOK_PATH
+    server = GameServer(args.workers, args.hash, args.queue_limit, args.idle_timeout, book)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import chess
+
+from ai import ChessAI
+from analysis import AnalysisSession
+from game import VariantBoard
+
+OPENING = ["e2e4", "e7e5", "g1f3", "b8c6", "f1c4"]
+
+
+def lines_of(lines):
+    return [(line.move, line.score, line.depth, line.pv) for line in lines]
+
+
+def searched(ai):
+    return ai.nodes + ai.qnodes
+
+
+def test_session_reanalyses_predicted_move_faster_than_cold():
+    # Playing the first move of the best line, the session's search state
+    # should make each re-analysis cheaper than a fresh engine's
+    for multipv in (1, 3):
+        board = VariantBoard()
+        session = AnalysisSession(multipv=multipv, hash_mb=4)
+        session.analyse(board, max_depth=5)
+        warm_nodes = cold_nodes = 0
+        for _ in range(6):
+            board.push(session.lines[0].move)
+            warm = session.analyse(board, max_depth=5)
+            warm_nodes += searched(session.ai)
+            cold_ai = ChessAI(hash_mb=4)
+            cold = cold_ai.analyse(board, multipv, max_depth=5)
+            cold_nodes += searched(cold_ai)
+            assert len(warm) == len(cold) == multipv
+            assert all(line.depth == 5 and board.is_legal(line.move) for line in warm)
+        assert warm_nodes < cold_nodes * (0.75 if multipv == 1 else 1.0)
+
+
+def test_deeper_request_continues_previous_analysis():
+    board = VariantBoard()
+    for uci in OPENING:
+        board.push(chess.Move.from_uci(uci))
+    session = AnalysisSession(multipv=2, hash_mb=4)
+    session.analyse(board, max_depth=3)
+    assert session.ai.can_continue_analysis(board, 2, 5)
+    continued = session.analyse(board, max_depth=5)
+    # Only depths 4 and 5 were searched, and the result is that of a single
+    # deeper call
+    assert [depth for depth, _, _ in session.ai.iterations] == [4, 5]
+    cold = ChessAI(hash_mb=4).analyse(board, 2, max_depth=5)
+    assert lines_of(continued) == lines_of(cold)
+
+
+def test_repeated_position_is_cached():
+    board = VariantBoard()
+    session = AnalysisSession(multipv=2, hash_mb=4)
+    first = session.analyse(board, max_depth=3)
+    assert session.analyse(board, max_depth=3) is first
+
+
+def test_single_line_matches_get_best_move_with_bitbases():
+    # KPK: the bitbase probes below the root must stay on in analyse()
+    for fen in ("8/8/8/4k3/8/8/3KP3/8 w - - 0 1", "8/8/4k3/8/8/3K4/8/7R w - - 0 1"):
+        engine = ChessAI(hash_mb=4)
+        move = engine.get_best_move(VariantBoard(fen), max_depth=5)
+        line = ChessAI(hash_mb=4).analyse(VariantBoard(fen), 1, max_depth=5)[0]
+        assert (line.move, line.score) == (move, engine.last_score)
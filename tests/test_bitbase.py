@@ -0,0 +1,93 @@
+import random
+import time
+
+import chess
+import pytest
+
+from bitbase import (BLACK_TO_MOVE, KPK_SIZE, KXK_SIZE, TABLES, WHITE_TO_MOVE, Bitbases, _random_position,
+                     generate_kpk, generate_kxk, selftest)
+
+SAMPLES = 500
+# Probes per second every table must sustain; about 700k/s on a laptop
+MIN_PROBE_RATE = 100_000
+
+
+@pytest.fixture(scope="module")
+def bitbases():
+    tables = Bitbases()
+    if set(tables.tables) != set(TABLES.values()):
+        pytest.skip("bitbases/ is incomplete; run python bitbase.py generate")
+    return tables
+
+
+@pytest.fixture(scope="module")
+def solved():
+    # Tables straight from the retrograde solver (~8s)
+    krk = generate_kxk(chess.ROOK)
+    kqk = generate_kxk(chess.QUEEN)
+    return {chess.ROOK: krk, chess.QUEEN: kqk, chess.PAWN: generate_kpk(krk, kqk)}
+
+
+def split_index(piece_type, index):
+    # Inverse of kxk_index / kpk_index: (flag, stm, wk, bk, piece)
+    index, piece = divmod(index, 64)
+    index, bk = divmod(index, 64)
+    index, wk = divmod(index, 64)
+    flag, stm = divmod(index, 2)
+    return flag, stm, wk, bk, piece
+
+
+@pytest.mark.parametrize("piece_type", TABLES.values())
+def test_index_round_trips(bitbases, piece_type):
+    rng = random.Random(piece_type)
+    size = KPK_SIZE if piece_type == chess.PAWN else KXK_SIZE
+    for _ in range(SAMPLES):
+        board = _random_position(piece_type, rng)
+        index = bitbases.index(board)
+        assert 0 <= index < size
+        flag, stm, wk, bk, piece = split_index(piece_type, index)
+        strong = bool(board.occupied_co[chess.WHITE] & ~board.kings)
+        mirror = 0 if strong else 56
+        extra = chess.lsb(board.occupied & ~board.kings)
+        assert (wk, bk, piece) == (board.king(strong) ^ mirror, board.king(not strong) ^ mirror,
+                                   extra ^ mirror)
+        assert stm == (WHITE_TO_MOVE if board.turn == strong else BLACK_TO_MOVE)
+        if piece_type == chess.PAWN:
+            used = bool(board.double_moved) and piece >= 16
+            assert flag == (0 if used else 1)
+        else:
+            assert flag == 0
+        # The color-flipped position is the same table entry
+        assert bitbases.index(board.mirror()) == index
+
+
+@pytest.mark.parametrize("piece_type", TABLES.values())
+def test_probe_matches_retrograde_solver(bitbases, solved, piece_type):
+    rng = random.Random(100 + piece_type)
+    bits = solved[piece_type]
+    for _ in range(SAMPLES):
+        board = _random_position(piece_type, rng)
+        index = bitbases.index(board)
+        wins = bool(bits[index >> 3] >> (index & 7) & 1)
+        strong = bool(board.occupied_co[chess.WHITE] & ~board.kings)
+        expected = 0 if not wins else 1 if board.turn == strong else -1
+        assert bitbases.probe(board) == expected
+
+
+def test_tables_agree_with_one_ply_search(bitbases, capsys):
+    assert selftest(bitbases, 200)
+
+
+@pytest.mark.parametrize("piece_type", TABLES.values())
+def test_lookup_throughput(bitbases, piece_type):
+    rng = random.Random(piece_type)
+    boards = [_random_position(piece_type, rng) for _ in range(256)]
+    probes = 50_000
+    # Best of three, so a busy machine doesn't fail the floor
+    rate = 0.0
+    for _ in range(3):
+        start = time.perf_counter()
+        for i in range(probes):
+            bitbases.probe(boards[i & 255])
+        rate = max(rate, probes / (time.perf_counter() - start))
+    assert rate >= MIN_PROBE_RATE
@@ -0,0 +1,42 @@
+import chess
+
+from book import BookBuilder, OpeningBook
+from game import VariantBoard
+
+# 2. a5 is a variant double move (a3-a5); 3... h4 is one for Black
+PGN = """[Event "variant"]
+[Result "1/2-1/2"]
+
+1. a3 h6 2. a5 h5 3. e4 h4 4. Nf3 1/2-1/2
+
+[Event "from a position"]
+[FEN "4k3/8/8/8/8/3P4/8/4K3 w - - 0 1"]
+[Result "*"]
+
+1. d5 Kd7 *
+"""
+
+
+def test_pgn_games_keep_their_variant_double_moves(tmp_path):
+    pgn = tmp_path / "games.pgn"
+    pgn.write_text(PGN)
+    builder = BookBuilder()
+    assert builder.add_pgn(str(pgn)) == 2
+    path = str(tmp_path / "book.bin")
+    builder.write(path)
+
+    book = OpeningBook(path)
+    try:
+        board = VariantBoard()
+        for uci in ("a2a3", "h7h6", "a3a5", "h6h5", "e2e4", "h5h4", "g1f3"):
+            move = chess.Move.from_uci(uci)
+            assert book.entries(board) == [(move, 1)]
+            board.push(move)
+        assert book.entries(board) == []
+
+        board = VariantBoard("4k3/8/8/8/8/3P4/8/4K3 w - - 0 1")
+        assert book.entries(board) == [(chess.Move.from_uci("d3d5"), 1)]
+        board.push(chess.Move.from_uci("d3d5"))
+        assert book.entries(board) == [(chess.Move.from_uci("e8d7"), 1)]
+    finally:
+        book.close()
@@ -0,0 +1,24 @@
+import pytest
+
+from game import VariantBoard
+from perft import POSITIONS
+
+
+@pytest.mark.parametrize("name,fen,counts", POSITIONS, ids=[name for name, _, _ in POSITIONS])
+def test_perft_reference_counts(name, fen, counts):
+    board = VariantBoard(fen)
+    key = board.zobrist_key
+    assert [board.perft(depth) for depth in (1, 2, 3)] == counts[:3]
+    # Every move pushed was popped again
+    assert board.zobrist_key == key and not board.move_stack
+
+
+def test_perft_counts_legal_moves():
+    # Bulk counting at the last ply must match the legal move generator
+    board = VariantBoard(POSITIONS[4][1])
+    nodes = 0
+    for move in list(board.legal_moves):
+        board.push(move)
+        nodes += board.legal_moves.count()
+        board.pop()
+    assert nodes == board.perft(2)
@@ -0,0 +1,28 @@
+from ai import ChessAI
+from game import VariantBoard
+
+
+def test_stats_cover_searches_and_analysis_only():
+    records = []
+    ai = ChessAI(hash_mb=4)
+    ai.enable_stats(records.append)
+    board = VariantBoard()
+    # Outside a search the plain evaluation runs and nothing is recorded
+    assert ai.evaluate_position(board) == ChessAI().evaluate_position(board)
+    assert ai.stats is None
+
+    lines = ai.analyse(board, 2, max_depth=3)
+    assert len(records) == 1
+    stats = records[0]
+    assert stats.source == "analysis"
+    assert stats.move == lines[0].move.uci() and stats.depth == 3
+    assert stats.eval_calls > 0 and stats.nodes == ai.nodes
+
+    # Later evaluations don't count into the finished search's stats
+    calls = stats.eval_calls
+    ai.evaluate_position(board)
+    assert stats.eval_calls == calls
+
+    ai.get_best_move(board, max_depth=3)
+    assert [record.source for record in records] == ["analysis", "search"]
+    assert records[1].eval_calls > 0
@@ -0,0 +1,68 @@
+import random
+
+import chess
+
+from game import VariantBoard, compute_material_pst
+
+START_FENS = [
+    chess.STARTING_FEN,
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "r1bqkbnr/pp1p1ppp/2n5/2p1p3/4P3/3P1N2/PPP2PPP/RNBQKB1R w KQkq - 0 4 e4c5",
+    "8/5k2/8/3p4/8/2P1P3/5K2/8 w - - 0 1 -",
+]
+
+
+def check(board: VariantBoard) -> None:
+    assert board.zobrist_key == board.compute_zobrist_key()
+    assert (board.material, board.pst) == compute_material_pst(board)
+
+
+def test_incremental_state_matches_recomputation_on_push_and_pop():
+    rng = random.Random(1234)
+    double_moves = 0
+    for fen in START_FENS:
+        for _ in range(25):
+            board = VariantBoard(fen)
+            check(board)
+            keys = []
+            for _ in range(60):
+                moves = list(board.legal_moves)
+                if not moves or (board.move_stack and rng.random() < 0.2):
+                    # Take back a few moves, checking each earlier position
+                    for _ in range(rng.randint(1, min(3, len(board.move_stack)))):
+                        board.pop()
+                        assert board.zobrist_key == keys.pop()
+                        check(board)
+                    continue
+                if not board.is_check() and rng.random() < 0.05:
+                    move = chess.Move.null()
+                else:
+                    move = rng.choice(moves)
+                    double_moves += board._is_variant_double_move(move)
+                keys.append(board.zobrist_key)
+                board.push(move)
+                check(board)
+            while board.move_stack:
+                board.pop()
+                assert board.zobrist_key == keys.pop()
+                check(board)
+    # The walk must have exercised the variant rule
+    assert double_moves > 0
+
+
+def test_double_move_mark_changes_key():
+    plain = VariantBoard("8/5k2/8/3p4/8/2P1P3/5K2/8 w - - 0 1 -")
+    marked = VariantBoard("8/5k2/8/3p4/8/2P1P3/5K2/8 w - - 0 1 c3")
+    assert plain.board_fen() == marked.board_fen()
+    assert plain.zobrist_key != marked.zobrist_key
+
+
+def test_transforms_keep_double_move_marks():
+    board = VariantBoard("4K3/k7/8/8/2P5/8/8/8 b - - 0 1 c4")
+    mirrored = board.mirror()
+    assert mirrored.variant_fen() == "8/8/8/2p5/8/8/K7/4k3 w - - 0 1 c5"
+    assert mirrored.zobrist_key == mirrored.compute_zobrist_key()
+    assert mirrored.mirror().zobrist_key == board.zobrist_key
+    flipped = board.transform(chess.flip_horizontal)
+    assert flipped.double_moved == chess.BB_F4
+    assert flipped.zobrist_key == flipped.compute_zobrist_key()
@@ -0,0 +1,312 @@
+import argparse
+import importlib
+import math
+import os
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import chess
+
+from game import VariantBoard
+
+# Engine-vs-engine matches between two ChessAI configurations, played in
+# parallel. Every opening is played twice with colors reversed.
+
+MAX_PLIES = 300
+# Openings: random plies from the start position, kept when roughly balanced
+OPENING_PLIES = 8
+OPENING_MAX_IMBALANCE = 80
+
+# Per-process engine cache, keyed by configuration string
+_engines: Dict[str, object] = {}
+
+
+# Keys accepted in an engine spec
+ENGINE_KEYS = ("name", "depth", "nodes", "time", "hash", "book", "factory")
+
+
+def parse_engine(spec: str) -> Dict[str, str]:
+    # "name=new,depth=4,nodes=20000,time=0.1,hash=16,factory=module:function"
+    config = {}
+    for item in filter(None, spec.split(",")):
+        key, _, value = item.partition("=")
+        key = key.strip()
+        if key not in ENGINE_KEYS:
+            raise ValueError(f"unknown engine option {key!r} in {spec!r}")
+        config[key] = value.strip()
+    return config
+
+
+def engine_limits(spec: str, time_limit: Optional[float],
+                  max_nodes: Optional[int]) -> Tuple[Optional[float], Optional[int]]:
+    # Per-move limits for one engine: nodes and time in its spec replace the
+    # limits given for the whole run
+    config = parse_engine(spec)
+    if "nodes" not in config and "time" not in config:
+        return time_limit, max_nodes
+    return (float(config["time"]) if "time" in config else None,
+            int(config["nodes"]) if "nodes" in config else None)
+
+
+def make_engine(spec: str):
+    # A factory ("module:function" returning a ChessAI, e.g. a subclass with a
+    # modified evaluation) lets two code variants play each other
+    from ai import ChessAI
+    engine = _engines.get(spec)
+    if engine is None:
+        config = parse_engine(spec)
+        kwargs = {"hash_mb": float(config.get("hash", 16)), "book": config.get("book") or None}
+        if "depth" in config:
+            kwargs["depth"] = int(config["depth"])
+        if "factory" in config:
+            module, _, function = config["factory"].partition(":")
+            engine = getattr(importlib.import_module(module), function)(**kwargs)
+        else:
+            engine = ChessAI(**kwargs)
+        _engines[spec] = engine
+    return engine
+
+
+def generate_openings(count: int, seed: int, plies: int = OPENING_PLIES) -> List[List[str]]:
+    # Random move sequences, at least half of them containing a variant
+    # double move (a pawn double step from beyond its starting rank)
+    from ai import ChessAI
+    rng = random.Random(seed)
+    evaluator = ChessAI(hash_mb=1, bitbases=None)
+    openings = []
+    seen = set()
+    while len(openings) < count:
+        board = VariantBoard()
+        variant_double = False
+        for _ in range(plies):
+            moves = list(board.legal_moves)
+            doubles = [m for m in moves if abs(m.to_square - m.from_square) == 16
+                       and board.pawns & chess.BB_SQUARES[m.from_square]
+                       and chess.square_rank(m.from_square) not in (1, 6)]
+            move = rng.choice(doubles) if doubles and rng.random() < 0.5 else rng.choice(moves)
+            variant_double |= move in doubles
+            board.push(move)
+            if board.is_game_over():
+                break
+        if board.is_game_over() or board.zobrist_key in seen:
+            continue
+        if len(openings) % 2 == 0 and not variant_double:
+            continue
+        if abs(evaluator.evaluate_position(board)) > OPENING_MAX_IMBALANCE:
+            continue
+        seen.add(board.zobrist_key)
+        openings.append([move.uci() for move in board.move_stack])
+    return openings
+
+
+def play_game(white: str, black: str, opening: List[str], time_limit: Optional[float],
+              max_nodes: Optional[int]) -> Tuple[str, List[str], str]:
+    # Returns the result, the SAN moves and the termination reason
+    engines = {chess.WHITE: make_engine(white), chess.BLACK: make_engine(black)}
+    limits = {chess.WHITE: engine_limits(white, time_limit, max_nodes),
+              chess.BLACK: engine_limits(black, time_limit, max_nodes)}
+    for engine in engines.values():
+        engine.transposition_table.clear()
+
+    board = VariantBoard()
+    san = []
+    for uci in opening:
+        move = chess.Move.from_uci(uci)
+        san.append(board.san(move))
+        board.push(move)
+
+    while True:
+        outcome = board.outcome(claim_draw=True)
+        if outcome is not None:
+            return outcome.result(), san, outcome.termination.name.lower()
+        if len(board.move_stack) >= MAX_PLIES:
+            return "1/2-1/2", san, "max plies"
+        move_time, move_nodes = limits[board.turn]
+        move = engines[board.turn].get_best_move(board, time_limit=move_time, max_nodes=move_nodes)
+        san.append(board.san(move))
+        board.push(move)
+
+
+def format_pgn(white: str, black: str, round_number: int, result: str, san: List[str],
+               termination: str, opening_plies: int) -> str:
+    headers = [("Event", "ChessAI tournament"), ("Site", "local"), ("Round", str(round_number)),
+               ("White", white), ("Black", black), ("Result", result), ("Rules", "any-rank double moves"),
+               ("Termination", termination), ("Opening", f"random {opening_plies} plies")]
+    lines = [f'[{name} "{value}"]' for name, value in headers]
+    text = []
+    for ply, move in enumerate(san):
+        if ply % 2 == 0:
+            text.append(f"{ply // 2 + 1}.")
+        text.append(move)
+    text.append(result)
+    # Wrap movetext at 80 columns
+    movetext, line = [], ""
+    for token in text:
+        if line and len(line) + 1 + len(token) > 80:
+            movetext.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    movetext.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n\n"
+
+
+def score_to_elo(score: float) -> float:
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+def elo_to_score(elo: float) -> float:
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+class MatchStats:
+    # Results from engine A's point of view
+    def __init__(self, elo0: float, elo1: float, alpha: float, beta: float):
+        self.wins = self.draws = self.losses = 0
+        self.elo0, self.elo1 = elo0, elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+
+    @property
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def add(self, score: float) -> None:
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def score(self) -> float:
+        return (self.wins + self.draws / 2) / self.games if self.games else 0.5
+
+    def variance(self) -> float:
+        # Per-game score variance from the observed win/draw/loss frequencies
+        n, s = self.games, self.score()
+        if not n:
+            return 0.0
+        return (self.wins * (1 - s) ** 2 + self.draws * (0.5 - s) ** 2 + self.losses * s ** 2) / n
+
+    def elo(self) -> Tuple[float, float]:
+        # Elo difference and its 95% confidence half-width
+        n, s = self.games, self.score()
+        if not n:
+            return 0.0, float("inf")
+        margin = 1.96 * math.sqrt(self.variance() / n)
+        low, high = score_to_elo(s - margin), score_to_elo(s + margin)
+        return score_to_elo(s), (high - low) / 2
+
+    def llr(self) -> float:
+        # Log-likelihood ratio of elo1 against elo0 (normal approximation of
+        # the trinomial model, as used by fishtest and cutechess)
+        variance = self.variance()
+        if not self.games or not variance:
+            return 0.0
+        s0, s1 = elo_to_score(self.elo0), elo_to_score(self.elo1)
+        return (s1 - s0) * (2 * self.score() - s0 - s1) * self.games / (2 * variance)
+
+    def sprt(self) -> Optional[str]:
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1 accepted"
+        if llr <= self.lower:
+            return "H0 accepted"
+        return None
+
+    def summary(self) -> str:
+        elo, margin = self.elo()
+        return (f"games {self.games}: +{self.wins} ={self.draws} -{self.losses}  score {self.score():.1%}  "
+                f"elo {elo:+.1f} +/- {margin:.1f}  LLR {self.llr():.2f} [{self.lower:.2f}, {self.upper:.2f}]")
+
+
+def run_match(engine_a: str, engine_b: str, games: int, workers: int, time_limit: Optional[float],
+              max_nodes: Optional[int], pgn_path: Optional[str], seed: int, stats: MatchStats) -> str:
+    openings = generate_openings((games + 1) // 2, seed)
+    name_a = parse_engine(engine_a).get("name", "A")
+    name_b = parse_engine(engine_b).get("name", "B")
+    jobs = []
+    for index in range(games):
+        # Same opening twice, A as white then A as black
+        a_white = index % 2 == 0
+        jobs.append((index + 1, a_white, openings[index // 2]))
+
+    pgn = open(pgn_path, "a") if pgn_path else None
+    verdict = None
+    start = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(workers) as executor:
+            pending = {}
+            queue = iter(jobs)
+            # Keep the pool busy without queueing the whole match, so an
+            # SPRT stop doesn't leave hundreds of games to cancel
+            for job in queue:
+                white, black = (engine_a, engine_b) if job[1] else (engine_b, engine_a)
+                pending[executor.submit(play_game, white, black, job[2], time_limit, max_nodes)] = job
+                if len(pending) >= workers * 2:
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    round_number, a_white, opening = pending.pop(future)
+                    result, san, termination = future.result()
+                    white_score = {"1-0": 1.0, "0-1": 0.0}.get(result, 0.5)
+                    stats.add(white_score if a_white else 1 - white_score)
+                    if pgn:
+                        white, black = (name_a, name_b) if a_white else (name_b, name_a)
+                        pgn.write(format_pgn(white, black, round_number, result, san, termination, len(opening)))
+                        pgn.flush()
+                    print(f"[{time.perf_counter() - start:6.1f}s] {stats.summary()}")
+                    verdict = verdict or stats.sprt()
+                if verdict:
+                    for future in pending:
+                        future.cancel()
+                    break
+                for job in queue:
+                    white, black = (engine_a, engine_b) if job[1] else (engine_b, engine_a)
+                    pending[executor.submit(play_game, white, black, job[2], time_limit, max_nodes)] = job
+                    if len(pending) >= workers * 2:
+                        break
+    finally:
+        if pgn:
+            pgn.close()
+    return verdict or "inconclusive"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Parallel engine-vs-engine tournament")
+    parser.add_argument("--engine-a", default="name=A",
+                        help="engine spec: name=..,depth=..,nodes=..,time=..,hash=..,book=..,"
+                             "factory=module:function; nodes and time override --nodes and --time")
+    parser.add_argument("--engine-b", default="name=B")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--time", type=float, help="seconds per move")
+    parser.add_argument("--nodes", type=int, help="nodes per move (default 20000 if no --time)")
+    parser.add_argument("--pgn", help="append finished games to this PGN file")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--elo0", type=float, default=0.0, help="SPRT null hypothesis")
+    parser.add_argument("--elo1", type=float, default=10.0, help="SPRT alternative hypothesis")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    args = parser.parse_args()
+
+    for spec in (args.engine_a, args.engine_b):
+        try:
+            parse_engine(spec)
+        except ValueError as error:
+            parser.error(str(error))
+    max_nodes = args.nodes if args.nodes or args.time else 20000
+    stats = MatchStats(args.elo0, args.elo1, args.alpha, args.beta)
+    verdict = run_match(args.engine_a, args.engine_b, args.games, args.workers, args.time, max_nodes,
+                        args.pgn, args.seed, stats)
+    print(f"final: {stats.summary()}")
+    print(f"SPRT({args.elo0:g}, {args.elo1:g}): {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+import chess
+import mmap
+import os
+import struct
+from multiprocessing import shared_memory
+from typing import Optional, Tuple, Dict
+
+# Bound types stored with each entry. Zero marks an empty slot.
+BOUND_EXACT = 1
+BOUND_LOWER = 2
+BOUND_UPPER = 3
+
+# key (8) + score (4) + move (2) + depth (1) + bound/generation (1)
+ENTRY_SIZE = 16
+BUCKET_SIZE = 2
+GENERATION_MASK = 0x3F
+# Snapshot file: magic, generation and entry count, then the raw table buffer
+FILE_HEADER = struct.Struct("<6sHQ")
+FILE_MAGIC = b"CHTT01"
+
+
+def pack_move(move: Optional[chess.Move]) -> int:
+    if not move:
+        return 0
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+
+def unpack_move(packed: int) -> Optional[chess.Move]:
+    if not packed:
+        return None
+    return chess.Move(packed & 63, (packed >> 6) & 63, (packed >> 12) or None)
+
+
+def table_entries(size_mb: float) -> int:
+    # Round down to a power of two number of buckets so the index is a mask
+    buckets = 1
+    while buckets * 2 * BUCKET_SIZE * ENTRY_SIZE <= size_mb * 1024 * 1024:
+        buckets *= 2
+    return buckets * BUCKET_SIZE
+
+
+class TranspositionTable:
+    def __init__(self, size_mb: float = 16):
+        self.size_mb = size_mb
+        self.num_entries = table_entries(size_mb)
+        self.bucket_mask = self.num_entries // BUCKET_SIZE - 1
+        self._allocate(self._new_buffer())
+        self.generation = 0
+        self.reset_stats()
+
+    def _new_buffer(self):
+        return bytearray(self.num_entries * ENTRY_SIZE)
+
+    def _allocate(self, buffer) -> None:
+        # All fields live in one buffer, split into typed views
+        n = self.num_entries
+        view = memoryview(buffer)
+        self.buffer = buffer
+        self.keys = view[:8 * n].cast('Q')
+        self.scores = view[8 * n:12 * n].cast('f')
+        self.moves = view[12 * n:14 * n].cast('H')
+        self.depths = view[14 * n:15 * n].cast('b')
+        self.meta = view[15 * n:16 * n].cast('B')
+
+    def reset_stats(self) -> None:
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.overwrites = 0
+        self.used = self.num_entries - bytes(self.meta).count(0)
+
+    def new_search(self) -> None:
+        # Entries from older generations become preferred replacement victims
+        self.generation = (self.generation + 1) & GENERATION_MASK
+
+    def clear(self) -> None:
+        self._allocate(self._new_buffer())
+        self.generation = 0
+        self.reset_stats()
+
+    def save(self, path: str) -> None:
+        # Written to a temporary file and renamed, so a table currently mapped
+        # from `path` keeps its pages
+        temp = path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(FILE_HEADER.pack(FILE_MAGIC, self.generation, self.num_entries))
+            f.write(self.buffer)
+        os.replace(temp, path)
+
+    def _read_snapshot(self, path: str):
+        # Copy-on-write mapping of a snapshot of this table's size, None if the
+        # file is missing or doesn't match
+        try:
+            with open(path, "rb") as f:
+                if os.fstat(f.fileno()).st_size != FILE_HEADER.size + self.num_entries * ENTRY_SIZE:
+                    return None
+                snapshot = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+        except OSError:
+            return None
+        magic, generation, entries = FILE_HEADER.unpack_from(snapshot)
+        if magic != FILE_MAGIC or entries != self.num_entries:
+            snapshot.close()
+            return None
+        return snapshot, generation
+
+    def load(self, path: str) -> bool:
+        # Maps the snapshot in place of the buffer: pages are read lazily and
+        # writes stay private to this process
+        found = self._read_snapshot(path)
+        if found is None:
+            return False
+        snapshot, generation = found
+        self._allocate(memoryview(snapshot)[FILE_HEADER.size:])
+        self.generation = generation
+        self.reset_stats()
+        return True
+
+    def probe(self, key: int) -> Optional[Tuple[int, int, float, Optional[chess.Move]]]:
+        self.probes += 1
+        index = (key & self.bucket_mask) * BUCKET_SIZE
+        for slot in (index, index + 1):
+            if self.keys[slot] == key and self.meta[slot]:
+                self.hits += 1
+                return self.depths[slot], self.meta[slot] & 3, self.scores[slot], unpack_move(self.moves[slot])
+        return None
+
+    def store(self, key: int, depth: int, bound: int, score: float, move: Optional[chess.Move]) -> None:
+        self.stores += 1
+        index = (key & self.bucket_mask) * BUCKET_SIZE
+        keys, meta, depths = self.keys, self.meta, self.depths
+        packed = pack_move(move)
+
+        if keys[index] == key and meta[index]:
+            slot = index
+        elif keys[index + 1] == key and meta[index + 1]:
+            slot = index + 1
+        else:
+            if (not meta[index] or (meta[index] >> 2) != self.generation
+                    or depth >= depths[index]):
+                slot = index
+                victim = index + 1 if meta[index] else index
+            else:
+                slot = victim = index + 1
+            if meta[victim]:
+                self.overwrites += 1
+            else:
+                self.used += 1
+            if victim != slot:
+                # Demote the depth-preferred entry to the always-replace slot
+                keys[victim] = keys[slot]
+                self.scores[victim] = self.scores[slot]
+                self.moves[victim] = self.moves[slot]
+                depths[victim] = depths[slot]
+                meta[victim] = meta[slot]
+            self.moves[slot] = 0
+
+        if not packed:
+            # Keep the best move found by an earlier search of this position
+            packed = self.moves[slot]
+
+        keys[slot] = key
+        self.scores[slot] = score
+        self.moves[slot] = packed
+        depths[slot] = max(-128, min(127, depth))
+        meta[slot] = bound | (self.generation << 2)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "size_mb": self.size_mb,
+            "entries": self.num_entries,
+            "probes": self.probes,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.probes if self.probes else 0.0,
+            "stores": self.stores,
+            "overwrites": self.overwrites,
+            "overwrite_rate": self.overwrites / self.stores if self.stores else 0.0,
+            "fill": self.used / self.num_entries,
+        }
+
+
+class SharedTranspositionTable(TranspositionTable):
+    # Same layout, backed by a named shared memory block so several search
+    # processes can read and write one table. Access is lock-free: a racing
+    # write can mix fields of two entries, which costs at most a bad score or
+    # a hash move that fails the legality check before it is played.
+    def __init__(self, size_mb: float = 16, name: Optional[str] = None):
+        self.size_mb = size_mb
+        self.num_entries = table_entries(size_mb)
+        self.bucket_mask = self.num_entries // BUCKET_SIZE - 1
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.num_entries * ENTRY_SIZE)
+        else:
+            # Attaching processes are children of the owner and share its
+            # resource tracker, so the block is unlinked exactly once
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.name = self.shm.name
+        self._allocate(self.shm.buf)
+        self.generation = 0
+        self.reset_stats()
+
+    def clear(self) -> None:
+        # Zero in place, other processes keep their mapping
+        self.shm.buf[:] = bytes(len(self.shm.buf))
+        self.generation = 0
+        self.reset_stats()
+
+    def load(self, path: str) -> bool:
+        # Copied into the shared block, which helpers already have mapped
+        found = self._read_snapshot(path)
+        if found is None:
+            return False
+        snapshot, generation = found
+        self.shm.buf[:] = snapshot[FILE_HEADER.size:]
+        snapshot.close()
+        self.generation = generation
+        self.reset_stats()
+        return True
+
+    def close(self) -> None:
+        if self.shm is None:
+            return
+        for view in (self.keys, self.scores, self.moves, self.depths, self.meta):
+            view.release()
+        self.buffer = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+        self.shm = None
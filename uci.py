@@ -0,0 +1,336 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from typing import List, Optional
+
+import chess
+
+from ai import ChessAI, MATE_BOUND, MATE_SCORE, MAX_DEPTH
+from game import VariantBoard
+
+# UCI front-end for tournament managers and GUIs. Commands are read on the
+# main thread while the search runs on its own thread, so "stop" and
+# "ponderhit" take effect at the search's next budget check. Positions may
+# use the seventh FEN field written by VariantBoard.variant_fen().
+
+ENGINE_NAME = "ChessAI variant"
+DEFAULT_HASH_MB = 16
+MAX_HASH_MB = 4096
+# Milliseconds kept back per move for GUI and process latency
+DEFAULT_MOVE_OVERHEAD = 50
+# Assumed number of moves still to play when the GUI doesn't send movestogo
+MOVES_TO_GO_MIN = 20
+MOVES_TO_GO_MAX = 50
+GO_KEYWORDS = {"wtime", "btime", "winc", "binc", "movestogo", "movetime", "nodes", "depth", "mate",
+               "infinite", "ponder", "searchmoves"}
+
+
+class TimeManager:
+    # Splits the remaining clock into a soft target, checked between
+    # iterations and scaled by how stable the best move is, and a hard limit
+    # that aborts the search mid-iteration
+    def __init__(self, overhead: float = DEFAULT_MOVE_OVERHEAD / 1000):
+        self.overhead = overhead
+        self.optimum: Optional[float] = None
+        self.maximum: Optional[float] = None
+        self._best_move: Optional[chess.Move] = None
+        self._stable_iterations = 0
+        self._first_score: Optional[float] = None
+
+    def start(self, remaining: Optional[float], increment: float, moves_to_go: Optional[int],
+              move_time: Optional[float], ply: int) -> None:
+        # Times in seconds; remaining is the side to move's clock
+        self._best_move = None
+        self._stable_iterations = 0
+        self._first_score = None
+        if move_time is not None:
+            self.optimum = self.maximum = max(move_time - self.overhead, 0.01)
+            return
+        if remaining is None:
+            self.optimum = self.maximum = None
+            return
+        # Keep a reserve so the clock never reaches zero, even with latency
+        # on every remaining move
+        available = max(remaining - self.overhead, 0.01)
+        if moves_to_go:
+            moves = min(moves_to_go, MOVES_TO_GO_MAX)
+        else:
+            moves = max(MOVES_TO_GO_MAX - ply // 2, MOVES_TO_GO_MIN)
+        self.optimum = min(available / moves + increment * 0.75, available * 0.5)
+        self.maximum = min(self.optimum * 4, available * 0.8 if moves > 1 else available)
+        self.optimum = min(self.optimum, self.maximum)
+
+    def iteration(self, move: Optional[chess.Move], score: float, seconds: float) -> bool:
+        # True when the search should not start another iteration
+        if self.optimum is None or self.optimum == self.maximum:
+            return False
+        if move == self._best_move:
+            self._stable_iterations += 1
+        else:
+            self._best_move = move
+            self._stable_iterations = 0
+        if self._first_score is None:
+            self._first_score = score
+        # A best move that keeps changing gets more time, a settled one less
+        factor = 1.6 if self._stable_iterations == 0 else 1.0 if self._stable_iterations < 3 else 0.5
+        # So does a falling score
+        if score < self._first_score - 50:
+            factor *= 1.5
+        return seconds >= min(self.optimum * factor, self.maximum)
+
+
+class UCIEngine:
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self._output_lock = threading.Lock()
+        self.hash_mb = DEFAULT_HASH_MB
+        self.threads = 1
+        self.move_overhead = DEFAULT_MOVE_OVERHEAD
+        self.ai: Optional[ChessAI] = None
+        self.board = VariantBoard()
+        self.time_manager = TimeManager()
+        self._thread: Optional[threading.Thread] = None
+        # Set while a ponder or infinite search must hold back its bestmove
+        self._hold = threading.Event()
+        self._pondering = False
+        self._ponder_limit: Optional[float] = None
+
+    def send(self, line: str) -> None:
+        with self._output_lock:
+            self.output.write(line + "\n")
+            self.output.flush()
+
+    def engine(self) -> ChessAI:
+        # Created on first use, so Hash and Threads set beforehand apply
+        if self.ai is None:
+            self.ai = ChessAI(hash_mb=self.hash_mb, workers=self.threads)
+            self.ai.iteration_callback = self._iteration
+        return self.ai
+
+    def run(self, lines) -> None:
+        for line in lines:
+            if not self.handle(line.strip()):
+                return
+        # End of input: let a finite search report, then shut down
+        self.wait()
+        self.handle("quit")
+
+    def handle(self, line: str) -> bool:
+        # Returns False on quit
+        tokens = line.split()
+        if not tokens:
+            return True
+        command, args = tokens[0], tokens[1:]
+        if command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("id author ChessAI")
+            self.send(f"option name Hash type spin default {DEFAULT_HASH_MB} min 1 max {MAX_HASH_MB}")
+            self.send(f"option name Threads type spin default 1 min 1 max {os.cpu_count() or 1}")
+            self.send("option name Ponder type check default false")
+            self.send(f"option name Move Overhead type spin default {DEFAULT_MOVE_OVERHEAD} min 0 max 5000")
+            self.send("uciok")
+        elif command == "isready":
+            self.engine()
+            self.send("readyok")
+        elif command == "setoption":
+            self.wait()
+            self.set_option(args)
+        elif command == "ucinewgame":
+            self.wait()
+            self.engine().new_game()
+        elif command == "position":
+            self.wait()
+            self.set_position(args)
+        elif command == "go":
+            self.wait()
+            self.go(args)
+        elif command == "stop":
+            self.stop()
+        elif command == "ponderhit":
+            self.ponderhit()
+        elif command == "quit":
+            self.stop()
+            if self.ai is not None:
+                self.ai.close()
+            return False
+        elif command == "d":
+            self.send(self.board.variant_fen())
+        return True
+
+    def set_option(self, args: List[str]) -> None:
+        # setoption name <name...> value <value>
+        if "value" in args:
+            split = args.index("value")
+            name, value = " ".join(args[1:split]).lower(), " ".join(args[split + 1:])
+        else:
+            name, value = " ".join(args[1:]).lower(), ""
+        try:
+            if name == "hash":
+                self.hash_mb = min(max(int(value), 1), MAX_HASH_MB)
+            elif name == "threads":
+                self.threads = max(int(value), 1)
+            elif name == "move overhead":
+                self.move_overhead = max(int(value), 0)
+                return
+            else:
+                return
+        except ValueError:
+            self.send(f"info string invalid value for {name}: {value}")
+            return
+        # The table size and worker count are fixed when the engine is built
+        if self.ai is not None:
+            self.ai.close()
+            self.ai = None
+
+    def set_position(self, args: List[str]) -> None:
+        moves_at = args.index("moves") if "moves" in args else len(args)
+        try:
+            if args and args[0] == "fen":
+                board = VariantBoard(" ".join(args[1:moves_at]))
+            else:
+                board = VariantBoard()
+            for uci in args[moves_at + 1:]:
+                move = chess.Move.from_uci(uci)
+                if not board.is_legal(move):
+                    raise ValueError(f"illegal move {uci}")
+                board.push(move)
+        except ValueError as error:
+            self.send(f"info string invalid position: {error}")
+            return
+        self.board = board
+
+    def go(self, args: List[str]) -> None:
+        params = {}
+        flags = set()
+        index = 0
+        while index < len(args):
+            token = args[index]
+            if token in ("infinite", "ponder"):
+                flags.add(token)
+            elif token == "searchmoves":
+                # Not supported; skip the move list
+                while index + 1 < len(args) and args[index + 1] not in GO_KEYWORDS:
+                    index += 1
+            elif index + 1 < len(args):
+                try:
+                    params[token] = int(args[index + 1])
+                except ValueError:
+                    pass
+                index += 1
+            index += 1
+
+        board = self.board.copy()
+        ai = self.engine()
+        turn = "w" if board.turn else "b"
+        remaining = params.get(f"{turn}time")
+        self.time_manager.overhead = self.move_overhead / 1000
+        self.time_manager.start(remaining / 1000 if remaining is not None else None,
+                                params.get(f"{turn}inc", 0) / 1000, params.get("movestogo"),
+                                params["movetime"] / 1000 if "movetime" in params else None,
+                                len(board.move_stack))
+        time_limit = self.time_manager.maximum
+        # A single legal move needs no search beyond finding it
+        if board.legal_moves.count() == 1 and time_limit is not None:
+            self.time_manager.optimum = 0.0
+        max_nodes = params.get("nodes")
+        max_depth = params.get("depth")
+
+        self._pondering = "ponder" in flags
+        if self._pondering:
+            # Searched without limits until ponderhit hands over the clock
+            self._ponder_limit = time_limit
+            time_limit = None
+        if max_depth is None:
+            max_depth = MAX_DEPTH
+        # Infinite and ponder searches report only after stop or ponderhit
+        if "infinite" in flags or self._pondering:
+            self._hold.clear()
+        else:
+            self._hold.set()
+
+        def search() -> None:
+            start = time.perf_counter()
+            move = ai.get_best_move(board, time_limit=time_limit, max_nodes=max_nodes, max_depth=max_depth)
+            self._hold.wait()
+            self._report(ai, time.perf_counter() - start)
+            if move is None:
+                self.send("bestmove 0000")
+            elif len(ai.pv) > 1:
+                self.send(f"bestmove {move.uci()} ponder {ai.pv[1].uci()}")
+            else:
+                self.send(f"bestmove {move.uci()}")
+
+        self._thread = threading.Thread(target=search, name="uci-search", daemon=True)
+        self._thread.start()
+
+    def _iteration(self, depth: int, score: float, seconds: float) -> bool:
+        ai = self.ai
+        self._report(ai, seconds)
+        if self._pondering:
+            return False
+        return self.time_manager.iteration(ai.pv[0] if ai.pv else None, score, seconds)
+
+    def _report(self, ai: ChessAI, seconds: float) -> None:
+        if not ai.completed_depth:
+            return
+        nodes = ai.nodes + ai.qnodes + ai.helper_nodes
+        score = ai.last_score
+        if abs(score) > MATE_BOUND:
+            plies = int(MATE_SCORE - abs(score))
+            moves = (plies + 1) // 2
+            score_text = f"mate {moves if score > 0 else -moves}"
+        else:
+            score_text = f"cp {int(round(score))}"
+        pv = " ".join(move.uci() for move in ai.pv)
+        self.send(f"info depth {ai.completed_depth} score {score_text} nodes {nodes} "
+                  f"time {int(seconds * 1000)} nps {int(nodes / seconds) if seconds > 0 else 0} pv {pv}")
+
+    def stop(self) -> None:
+        thread = self._thread
+        if thread is None:
+            return
+        self._pondering = False
+        self._hold.set()
+        # The search clears the stop request when it starts, so repeat it
+        # until the thread has finished
+        while thread.is_alive():
+            self.ai.stop()
+            thread.join(0.01)
+        self._thread = None
+
+    def ponderhit(self) -> None:
+        # The expected move was played: the ponder search continues on the
+        # clock it would have had for this move
+        if not self._pondering:
+            return
+        self._pondering = False
+        self.ai.ponderhit(self._ponder_limit)
+        self._hold.set()
+
+    def wait(self) -> None:
+        # Commands that change the engine or position wait for a finite search
+        # to finish; GUIs send stop first for infinite ones
+        thread = self._thread
+        if thread is not None:
+            if not self._hold.is_set():
+                self.stop()
+            thread.join()
+            self._thread = None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="UCI interface to ChessAI")
+    parser.add_argument("--hash", type=int, default=DEFAULT_HASH_MB, help="transposition table size in MB")
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    engine = UCIEngine()
+    engine.hash_mb = args.hash
+    engine.threads = args.threads
+    engine.run(sys.stdin)
+
+
+if __name__ == "__main__":
+    main()